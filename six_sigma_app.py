@@ -16,13 +16,11 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-from scipy import stats
-from scipy.stats import anderson, shapiro
-import statsmodels.api as sm
 from datetime import datetime, timedelta
+import math
+import bisect
+import itertools
+from six_sigma_common import add_reference_lines, load_uploaded_data
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -41,8 +39,7 @@ st.set_page_config(
 # CUSTOM CSS
 # ═══════════════════════════════════════════════════════════════════════════════
 
-st.markdown("""
-<style>
+_CSS = """
     .main {background-color: #f8f9fa;}
     
     .hero-box {
@@ -121,8 +118,15 @@ st.markdown("""
         border-left: 5px solid #667eea;
         box-shadow: 0 2px 8px rgba(0,0,0,0.1);
     }
-</style>
-""", unsafe_allow_html=True)
+"""
+
+# Wrapped once at import. st.html skips the Markdown parser, and a style-only
+# block is applied to the page without taking layout space. It cannot sit
+# behind st.cache_resource: style blocks go to the event container, which
+# cached element replay does not support.
+_STYLE_TAG = f"<style>{_CSS}</style>"
+
+st.html(_STYLE_TAG)
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # HELPER FUNCTIONS - AUTO DETECTION
@@ -191,160 +195,184 @@ def auto_detect_specifications(data):
     
     return lsl, usl, target
 
+# Interpretation tables, ordered by ascending threshold. The first row is the
+# fallback for values below every threshold.
+_SIGMA_THRESHOLDS = (2, 3, 4, 5, 6)
+_SIGMA_LEVELS = (
+    {
+        'level': 'Critical',
+        'color': '⛔',
+        'quality': '{yield_pct:.1f}% yield - {dpmo:.0f} DPMO',
+        'benchmark': 'Non-competitive - Survival threatened',
+        'examples': 'Operations in crisis',
+        'action': 'EMERGENCY: Business viability at risk. Immediate action required.',
+        'business_impact': 'Unsustainable. Major customer loss imminent.',
+        'recommendation': 'STOP and fix immediately. Consider process shutdown until stable.'
+    },
+    {
+        'level': 'Poor',
+        'color': '🔴',
+        'quality': '69.1% yield - {dpmo:.0f} DPMO',
+        'benchmark': 'Below average - Bottom quartile',
+        'examples': 'Struggling operations, high rework environments',
+        'action': 'CRITICAL SITUATION. Immediate executive intervention required.',
+        'business_impact': 'Very high costs (30-40% of sales), customer defection risk',
+        'recommendation': 'CRISIS MODE: Daily management review. Emergency improvement team.'
+    },
+    {
+        'level': 'Average',
+        'color': '🟠',
+        'quality': '93.3% yield - {dpmo:.0f} DPMO',
+        'benchmark': 'Typical industry performance',
+        'examples': 'Traditional manufacturing, typical service industries',
+        'action': 'SIGNIFICANT IMPROVEMENT OPPORTUNITY. Start DMAIC projects immediately.',
+        'business_impact': 'High quality costs (15-25% of sales), customer complaints common',
+        'recommendation': 'URGENT: Launch 3-5 improvement projects. Quick wins needed.'
+    },
+    {
+        'level': 'Good',
+        'color': '🟡',
+        'quality': '99.38% yield - {dpmo:.0f} DPMO',
+        'benchmark': 'Above average - Top quartile',
+        'examples': 'Modern manufacturing, good service operations',
+        'action': 'Good foundation. Focus improvement on critical CTQs to reach 5 Sigma.',
+        'business_impact': 'Competitive, moderate quality costs (5-10% of sales)',
+        'recommendation': 'Identify top 3 improvement opportunities. Launch DMAIC projects.'
+    },
+    {
+        'level': 'Excellent',
+        'color': '🟢',
+        'quality': '99.98% yield - {dpmo:.0f} DPMO',
+        'benchmark': 'Top 5% - Industry leading',
+        'examples': 'Top automotive, leading hospitals, best-in-class manufacturing',
+        'action': 'Sustain and target 6 Sigma for critical processes',
+        'business_impact': 'Strong competitive advantage, high customer loyalty',
+        'recommendation': 'Continue current practices. Document and standardize.'
+    },
+    {
+        'level': 'World Class',
+        'color': '🟢',
+        'quality': '99.99966% yield - {dpmo:.1f} DPMO',
+        'benchmark': 'Top 0.1% of companies globally',
+        'examples': 'Aviation safety, pharmaceutical critical processes',
+        'action': 'Maintain excellence. Share best practices across organization.',
+        'business_impact': 'Premium pricing power, industry leadership, minimal quality costs',
+        'recommendation': 'Focus on sustaining performance and knowledge transfer'
+    },
+)
+
+_CPK_THRESHOLDS = (1.0, 1.33, 1.67, 2.0)
+_CPK_RATINGS = (
+    {
+        'rating': 'Not Capable',
+        'color': '🔴',
+        'meaning': 'Process cannot consistently meet specifications',
+        'defect_rate': '> 2,700 PPM - High defect rate',
+        'action': 'CRITICAL: 100% inspection required. Process improvement mandatory.',
+        'business_value': 'Unsustainable. Major quality costs. Customer dissatisfaction.'
+    },
+    {
+        'rating': 'Marginal - Barely Capable',
+        'color': '🟠',
+        'meaning': 'Process barely meets specifications',
+        'defect_rate': '~2,700 PPM (0.27%)',
+        'action': 'IMPROVEMENT NEEDED. Increase monitoring. Center process if possible.',
+        'business_value': 'High risk. Customer complaints likely. Improvement urgent.'
+    },
+    {
+        'rating': 'Good - Capable',
+        'color': '🟡',
+        'meaning': 'Process meets requirements but limited margin',
+        'defect_rate': '< 63 PPM expected',
+        'action': 'Adequate. Monitor regularly. Variation reduction would improve margin.',
+        'business_value': 'Acceptable quality. Some inspection still recommended.'
+    },
+    {
+        'rating': 'Very Good - Five Sigma Capable',
+        'color': '🟢',
+        'meaning': 'Process consistently meets requirements',
+        'defect_rate': '< 0.6 PPM expected',
+        'action': 'Maintain current performance. Reduce inspection frequency.',
+        'business_value': 'Excellent quality. Low inspection costs justified.'
+    },
+    {
+        'rating': 'Excellent - Six Sigma Capable',
+        'color': '🟢',
+        'meaning': 'Process exceeds requirements with large safety margin',
+        'defect_rate': '< 3.4 PPM - Virtually defect-free',
+        'action': 'Monitor periodically. Consider process optimization for cost reduction.',
+        'business_value': 'Premium quality. Potential for spec tightening or cost reduction.'
+    },
+)
+
+@st.cache_data(show_spinner=False)
 def interpret_sigma_level(sigma, dpmo):
     """Detailed interpretation of Sigma level"""
     
-    if sigma >= 6:
-        return {
-            'level': 'World Class',
-            'color': '🟢',
-            'quality': f'99.99966% yield - {dpmo:.1f} DPMO',
-            'benchmark': 'Top 0.1% of companies globally',
-            'examples': 'Aviation safety, pharmaceutical critical processes',
-            'action': 'Maintain excellence. Share best practices across organization.',
-            'business_impact': 'Premium pricing power, industry leadership, minimal quality costs',
-            'recommendation': 'Focus on sustaining performance and knowledge transfer'
-        }
-    elif sigma >= 5:
-        return {
-            'level': 'Excellent',
-            'color': '🟢',
-            'quality': f'99.98% yield - {dpmo:.0f} DPMO',
-            'benchmark': 'Top 5% - Industry leading',
-            'examples': 'Top automotive, leading hospitals, best-in-class manufacturing',
-            'action': 'Sustain and target 6 Sigma for critical processes',
-            'business_impact': 'Strong competitive advantage, high customer loyalty',
-            'recommendation': 'Continue current practices. Document and standardize.'
-        }
-    elif sigma >= 4:
-        return {
-            'level': 'Good',
-            'color': '🟡',
-            'quality': f'99.38% yield - {dpmo:.0f} DPMO',
-            'benchmark': 'Above average - Top quartile',
-            'examples': 'Modern manufacturing, good service operations',
-            'action': 'Good foundation. Focus improvement on critical CTQs to reach 5 Sigma.',
-            'business_impact': 'Competitive, moderate quality costs (5-10% of sales)',
-            'recommendation': 'Identify top 3 improvement opportunities. Launch DMAIC projects.'
-        }
-    elif sigma >= 3:
-        return {
-            'level': 'Average',
-            'color': '🟠',
-            'quality': f'93.3% yield - {dpmo:.0f} DPMO',
-            'benchmark': 'Typical industry performance',
-            'examples': 'Traditional manufacturing, typical service industries',
-            'action': 'SIGNIFICANT IMPROVEMENT OPPORTUNITY. Start DMAIC projects immediately.',
-            'business_impact': 'High quality costs (15-25% of sales), customer complaints common',
-            'recommendation': 'URGENT: Launch 3-5 improvement projects. Quick wins needed.'
-        }
-    elif sigma >= 2:
-        return {
-            'level': 'Poor',
-            'color': '🔴',
-            'quality': f'69.1% yield - {dpmo:.0f} DPMO',
-            'benchmark': 'Below average - Bottom quartile',
-            'examples': 'Struggling operations, high rework environments',
-            'action': 'CRITICAL SITUATION. Immediate executive intervention required.',
-            'business_impact': 'Very high costs (30-40% of sales), customer defection risk',
-            'recommendation': 'CRISIS MODE: Daily management review. Emergency improvement team.'
-        }
-    else:
-        return {
-            'level': 'Critical',
-            'color': '⛔',
-            'quality': f'{(1-dpmo/1000000)*100:.1f}% yield - {dpmo:.0f} DPMO',
-            'benchmark': 'Non-competitive - Survival threatened',
-            'examples': 'Operations in crisis',
-            'action': 'EMERGENCY: Business viability at risk. Immediate action required.',
-            'business_impact': 'Unsustainable. Major customer loss imminent.',
-            'recommendation': 'STOP and fix immediately. Consider process shutdown until stable.'
-        }
+    # NaN falls through to the lowest tier (bisect would place it at the top)
+    tier = 0 if math.isnan(sigma) else bisect.bisect_right(_SIGMA_THRESHOLDS, sigma)
+    interp = dict(_SIGMA_LEVELS[tier])
+    interp['quality'] = interp['quality'].format(dpmo=dpmo, yield_pct=(1 - dpmo/1000000) * 100)
+    return interp
 
+@st.cache_data(show_spinner=False)
 def interpret_cpk(cpk, cp):
     """Detailed Cpk interpretation"""
     
-    if cpk >= 2.0:
-        return {
-            'rating': 'Excellent - Six Sigma Capable',
-            'color': '🟢',
-            'meaning': 'Process exceeds requirements with large safety margin',
-            'defect_rate': '< 3.4 PPM - Virtually defect-free',
-            'action': 'Monitor periodically. Consider process optimization for cost reduction.',
-            'business_value': 'Premium quality. Potential for spec tightening or cost reduction.'
-        }
-    elif cpk >= 1.67:
-        return {
-            'rating': 'Very Good - Five Sigma Capable',
-            'color': '🟢',
-            'meaning': 'Process consistently meets requirements',
-            'defect_rate': '< 0.6 PPM expected',
-            'action': 'Maintain current performance. Reduce inspection frequency.',
-            'business_value': 'Excellent quality. Low inspection costs justified.'
-        }
-    elif cpk >= 1.33:
-        return {
-            'rating': 'Good - Capable',
-            'color': '🟡',
-            'meaning': 'Process meets requirements but limited margin',
-            'defect_rate': '< 63 PPM expected',
-            'action': 'Adequate. Monitor regularly. Variation reduction would improve margin.',
-            'business_value': 'Acceptable quality. Some inspection still recommended.'
-        }
-    elif cpk >= 1.0:
-        return {
-            'rating': 'Marginal - Barely Capable',
-            'color': '🟠',
-            'meaning': 'Process barely meets specifications',
-            'defect_rate': '~2,700 PPM (0.27%)',
-            'action': 'IMPROVEMENT NEEDED. Increase monitoring. Center process if possible.',
-            'business_value': 'High risk. Customer complaints likely. Improvement urgent.'
-        }
-    else:
-        return {
-            'rating': 'Not Capable',
-            'color': '🔴',
-            'meaning': 'Process cannot consistently meet specifications',
-            'defect_rate': f'> 2,700 PPM - High defect rate',
-            'action': 'CRITICAL: 100% inspection required. Process improvement mandatory.',
-            'business_value': 'Unsustainable. Major quality costs. Customer dissatisfaction.'
-        }
+    tier = 0 if math.isnan(cpk) else bisect.bisect_right(_CPK_THRESHOLDS, cpk)
+    return dict(_CPK_RATINGS[tier])
+
+_PHASE_WEEKS = {
+    'Manufacturing': (('Define', 3), ('Measure', 5), ('Analyze', 4), ('Improve', 8), ('Control', 2)),
+    'Service': (('Define', 2), ('Measure', 6), ('Analyze', 5), ('Improve', 10), ('Control', 3)),
+    'Transactional': (('Define', 2), ('Measure', 4), ('Analyze', 4), ('Improve', 6), ('Control', 2))
+}
+
+# Cumulative week offsets per project type (date independent), built with the table
+_PHASE_OFFSETS = {
+    project_type: tuple(itertools.accumulate((weeks for _, weeks in phases), initial=0))
+    for project_type, phases in _PHASE_WEEKS.items()
+}
 
 def generate_auto_timeline(project_type='Manufacturing'):
     """Generate automatic project timeline"""
     
-    phases = {
-        'Manufacturing': {'Define': 3, 'Measure': 5, 'Analyze': 4, 'Improve': 8, 'Control': 2},
-        'Service': {'Define': 2, 'Measure': 6, 'Analyze': 5, 'Improve': 10, 'Control': 3},
-        'Transactional': {'Define': 2, 'Measure': 4, 'Analyze': 4, 'Improve': 6, 'Control': 2}
-    }
+    if project_type not in _PHASE_WEEKS:
+        project_type = 'Manufacturing'
+    phases, offsets = _PHASE_WEEKS[project_type], _PHASE_OFFSETS[project_type]
+    total_weeks = offsets[-1]
     
-    timeline = phases.get(project_type, phases['Manufacturing'])
-    total_weeks = sum(timeline.values())
+    # One clock read; every phase boundary is an offset from it
+    start_date = datetime.now()
+    bounds = [start_date + timedelta(weeks=w) for w in offsets]
     
     return {
-        'phases': timeline,
+        'phases': dict(phases),
+        'schedule': [(phase, weeks, bounds[i], bounds[i + 1]) for i, (phase, weeks) in enumerate(phases)],
         'total_weeks': total_weeks,
         'total_months': round(total_weeks / 4, 1),
-        'end_date': datetime.now() + timedelta(weeks=total_weeks)
+        'end_date': bounds[-1]
     }
 
+_INV_SQRT2 = 1 / math.sqrt(2)
+
+def calculate_dpmo_from_sigma(sigma):
+    """DPMO for a short-term Sigma level (1.5 sigma shift), via the normal upper tail"""
+    return 0.5 * math.erfc((sigma - 1.5) * _INV_SQRT2) * 1_000_000
+
+# Industry average costs
+_COST_PER_DEFECT = 75          # Average of scrap, rework, warranty
+_PROJECT_INVESTMENT = 50000    # Black Belt time + resources (typical)
+
+@st.cache_data(show_spinner=False)
 def calculate_financial_impact(current_dpmo, target_dpmo, annual_volume):
     """Calculate financial impact of improvement"""
     
-    # Industry average costs
-    cost_per_defect = 75  # Average of scrap, rework, warranty
-    
-    current_defects = annual_volume * (current_dpmo / 1_000_000)
-    target_defects = annual_volume * (target_dpmo / 1_000_000)
-    defects_avoided = current_defects - target_defects
-    
-    annual_savings = defects_avoided * cost_per_defect
+    defects_avoided = annual_volume * (current_dpmo - target_dpmo) / 1_000_000
+    annual_savings = defects_avoided * _COST_PER_DEFECT
+    project_investment = _PROJECT_INVESTMENT
     
-    # Project investment (typical)
-    project_investment = 50000  # Black Belt time + resources
-    
-    roi = ((annual_savings - project_investment) / project_investment) * 100 if project_investment > 0 else 0
+    roi = (annual_savings - project_investment) / project_investment * 100
     payback_months = (project_investment / annual_savings * 12) if annual_savings > 0 else 999
     
     return {
@@ -355,6 +383,152 @@ def calculate_financial_impact(current_dpmo, target_dpmo, annual_volume):
         'payback_months': payback_months
     }
 
+def _make_line(x=None, y=None, mode='lines+markers', **kw):
+    """WebGL scatter trace for control charts (stays responsive on long series)"""
+    return go.Scattergl(x=x, y=y, mode=mode, **kw)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# IMPROVEMENT PLAN SECTIONS
+# ═══════════════════════════════════════════════════════════════════════════════
+# Fragments: moving the target-Sigma slider or volume input reruns only the
+# plan below it, not the upload, analysis and charts above.
+
+_NEXT_STEP_TMPL = """
+        <div class="recommendation-box">
+        <h4>{step}</h4>
+        <p>{detail}</p>
+        <p><b>Timeline:</b> {timeline}</p>
+        </div>"""
+
+# (step, detail, timeline); details are str.format templates over the financials dict
+_NEXT_STEPS_STATIC = (
+    ('1. Get Management Approval',
+     'Present business case: ${annual_savings:,.0f} annual savings with {roi:.0f}% ROI', 'Week 1'),
+    ('2. Form Project Team',
+     'Identify Black Belt, process owner, and team members (5-7 people recommended)', 'Week 1'),
+    ('3. Launch Define Phase',
+     'Create project charter, SIPOC diagram, and stakeholder analysis', 'Weeks 1-3'),
+    ('4. Validate Measurement System',
+     'Conduct Gage R&R study to ensure measurement reliability', 'Weeks 4-5'),
+    ('5. Begin Root Cause Analysis',
+     'Use Fishbone, 5 Whys, and statistical analysis to identify critical Xs', 'Weeks 6-9'),
+)
+
+@st.fragment
+def _render_improvement_plan(ctq_col, sigma_level, dpmo):
+    """Financial impact, project plan, timeline and next steps for continuous data"""
+    
+    # Fragment reruns skip the page-level try/except; report errors the same way
+    try:
+        # Financial Analysis
+        st.markdown("---")
+        st.markdown("### 💰 Financial Impact Analysis")
+        
+        annual_volume = st.number_input(
+            "Annual Production Volume:",
+            value=100000,
+            step=10000,
+            help="Enter your annual production volume to calculate financial impact"
+        )
+        
+        target_sigma = st.slider(
+            "Target Sigma Level (Improvement Goal):",
+            min_value=float(max(sigma_level, 3.0)),
+            max_value=6.0,
+            value=float(min(sigma_level + 1, 6.0)),
+            step=0.5
+        )
+        
+        target_dpmo = calculate_dpmo_from_sigma(target_sigma)
+        
+        financials = calculate_financial_impact(dpmo, target_dpmo, annual_volume)
+        
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Annual Savings", f"${financials['annual_savings']:,.0f}")
+        col2.metric("ROI", f"{financials['roi']:.0f}%")
+        col3.metric("Payback Period", f"{financials['payback_months']:.1f} months")
+        
+        st.markdown(f"""
+        <div class="success-box">
+        <h4>📈 Improvement Scenario: {sigma_level:.1f}σ → {target_sigma:.1f}σ</h4>
+        <p><b>Defects avoided annually:</b> {financials['defects_avoided']:,.0f}</p>
+        <p><b>Annual cost savings:</b> ${financials['annual_savings']:,.0f}</p>
+        <p><b>Project investment:</b> ${financials['investment']:,.0f}</p>
+        <p><b>Return on Investment:</b> {financials['roi']:.0f}%</p>
+        <p><b>Payback period:</b> {financials['payback_months']:.1f} months</p>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        # AUTO-GENERATED PROJECT PLAN
+        st.markdown("---")
+        st.markdown("## 📋 AUTO-GENERATED PROJECT PLAN")
+        
+        timeline = generate_auto_timeline('Manufacturing')
+        
+        st.markdown(f"""
+        <div class="interpretation-box">
+        <h3 style="color: white;">🎯 Recommended DMAIC Project</h3>
+        <p style="color: white; font-size: 1.2em;"><b>Project Name:</b> Improve {ctq_col} Process Capability</p>
+        <p style="color: white;"><b>Goal:</b> Reduce DPMO from {dpmo:,.0f} to {target_dpmo:,.0f} ({target_sigma:.1f} Sigma)</p>
+        <p style="color: white;"><b>Expected Timeline:</b> {timeline['total_weeks']} weeks ({timeline['total_months']} months)</p>
+        <p style="color: white;"><b>Expected Savings:</b> ${financials['annual_savings']:,.0f} per year</p>
+        <p style="color: white;"><b>ROI:</b> {financials['roi']:.0f}%</p>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        # Timeline breakdown
+        st.markdown("### 📅 Project Timeline")
+        
+        # One element for all phases rather than one websocket delta per phase
+        st.markdown("\n".join(f"""
+            <div class="step-box">
+            <h4>{phase} Phase</h4>
+            <p><b>Duration:</b> {weeks} weeks</p>
+            <p><b>Start:</b> {start_date.strftime('%Y-%m-%d')} | <b>End:</b> {end_date.strftime('%Y-%m-%d')}</p>
+            </div>""" for phase, weeks, start_date, end_date in timeline['schedule']), unsafe_allow_html=True)
+        
+        # Next Steps
+        st.markdown("---")
+        st.markdown("## ✅ Recommended Next Steps")
+        
+        st.markdown("\n".join(
+            _NEXT_STEP_TMPL.format(step=step, detail=detail.format(**financials), timeline=timeline)
+            for step, detail, timeline in _NEXT_STEPS_STATIC), unsafe_allow_html=True)
+    except Exception as e:
+        st.error(f"❌ Error analyzing data: {str(e)}")
+        st.info("Please ensure your data is in the correct format (CSV or Excel with headers)")
+
+@st.fragment
+def _render_discrete_plan(sigma_level, dpmo):
+    """Financial impact and project summary for defect data"""
+    
+    # Fragment reruns skip the page-level try/except; report errors the same way
+    try:
+        # Auto project plan for discrete
+        st.markdown("---")
+        st.markdown("## 📋 AUTO-GENERATED IMPROVEMENT PROJECT")
+        
+        annual_volume = st.number_input("Annual Volume:", value=1000000, step=100000)
+        target_sigma = st.slider("Target Sigma:", min_value=float(max(sigma_level, 3)), max_value=6.0, value=float(min(sigma_level+1, 6)), step=0.5)
+        
+        target_dpmo_discrete = calculate_dpmo_from_sigma(target_sigma)
+        financials_discrete = calculate_financial_impact(dpmo, target_dpmo_discrete, annual_volume)
+        
+        timeline_discrete = generate_auto_timeline('Manufacturing')
+        
+        st.markdown(f"""
+        <div class="interpretation-box">
+        <h3 style="color: white;">🎯 Defect Reduction Project</h3>
+        <p style="color: white; font-size: 1.2em;"><b>Goal:</b> Reduce defect rate from {dpmo:,.0f} to {target_dpmo_discrete:,.0f} DPMO</p>
+        <p style="color: white;"><b>Timeline:</b> {timeline_discrete['total_weeks']} weeks</p>
+        <p style="color: white;"><b>Expected Savings:</b> ${financials_discrete['annual_savings']:,.0f}/year</p>
+        <p style="color: white;"><b>ROI:</b> {financials_discrete['roi']:.0f}%</p>
+        </div>
+        """, unsafe_allow_html=True)
+    except Exception as e:
+        st.error(f"❌ Error analyzing data: {str(e)}")
+        st.info("Please ensure your data is in the correct format (CSV or Excel with headers)")
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # MAIN APP
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -398,15 +572,17 @@ uploaded_file = st.file_uploader(
 
 if uploaded_file is not None:
     
+    # Charting and stats stack is only needed once there is data; importing it
+    # here keeps the empty landing page from paying for scipy/plotly at startup.
+    import plotly.graph_objects as go
+    from scipy import stats
+    
     # ═══════════════════════════════════════════════════════════════════════════
     # DATA LOADING
     # ═══════════════════════════════════════════════════════════════════════════
     
     try:
-        if uploaded_file.name.endswith('.csv'):
-            df = pd.read_csv(uploaded_file)
-        else:
-            df = pd.read_excel(uploaded_file)
+        df = load_uploaded_data(uploaded_file.getvalue(), uploaded_file.name)
         
         st.success(f"✅ File loaded successfully: {len(df)} rows, {len(df.columns)} columns")
         
@@ -471,12 +647,13 @@ if uploaded_file is not None:
             cpk = min(cpu, cpl)
             
             defects = ((data < lsl) | (data > usl)).sum()
-            dpmo = (defects / len(data)) * 1_000_000
+            defect_rate = defects / len(data)
+            dpmo = defect_rate * 1_000_000
             
             if dpmo >= 933193:
                 sigma_level = 0
             else:
-                sigma_level = stats.norm.ppf(1 - dpmo/1_000_000) + 1.5
+                sigma_level = stats.norm.ppf(1 - defect_rate) + 1.5
             
             # ═══════════════════════════════════════════════════════════════════
             # RESULTS WITH DETAILED INTERPRETATIONS
@@ -490,9 +667,9 @@ if uploaded_file is not None:
             col1.metric("Current Sigma Level", f"{sigma_level:.2f}")
             col2.metric("DPMO", f"{dpmo:,.0f}")
             col3.metric("Cpk", f"{cpk:.3f}")
-            col4.metric("Yield", f"{(1-dpmo/1000000)*100:.2f}%")
+            col4.metric("Yield", f"{(1 - defect_rate) * 100:.2f}%")
             
-            # Sigma Interpretation
+            # Sigma Interpretation and recommended action (one element)
             sigma_interp = interpret_sigma_level(sigma_level, dpmo)
             
             st.markdown(f"""
@@ -504,9 +681,7 @@ if uploaded_file is not None:
             <hr style="border-color: rgba(255,255,255,0.3);">
             <p style="color: white;"><b>Business Impact:</b> {sigma_interp['business_impact']}</p>
             </div>
-            """, unsafe_allow_html=True)
             
-            st.markdown(f"""
             <div class="recommendation-box">
             <h3>💡 Recommended Action</h3>
             <p><b>{sigma_interp['action']}</b></p>
@@ -530,79 +705,6 @@ if uploaded_file is not None:
             </div>
             """, unsafe_allow_html=True)
             
-            # Financial Analysis
-            st.markdown("---")
-            st.markdown("### 💰 Financial Impact Analysis")
-            
-            annual_volume = st.number_input(
-                "Annual Production Volume:",
-                value=100000,
-                step=10000,
-                help="Enter your annual production volume to calculate financial impact"
-            )
-            
-            target_sigma = st.slider(
-                "Target Sigma Level (Improvement Goal):",
-                min_value=float(max(sigma_level, 3.0)),
-                max_value=6.0,
-                value=float(min(sigma_level + 1, 6.0)),
-                step=0.5
-            )
-            
-            target_dpmo = (1 - stats.norm.cdf(target_sigma - 1.5)) * 1_000_000
-            
-            financials = calculate_financial_impact(dpmo, target_dpmo, annual_volume)
-            
-            col1, col2, col3 = st.columns(3)
-            col1.metric("Annual Savings", f"${financials['annual_savings']:,.0f}")
-            col2.metric("ROI", f"{financials['roi']:.0f}%")
-            col3.metric("Payback Period", f"{financials['payback_months']:.1f} months")
-            
-            st.markdown(f"""
-            <div class="success-box">
-            <h4>📈 Improvement Scenario: {sigma_level:.1f}σ → {target_sigma:.1f}σ</h4>
-            <p><b>Defects avoided annually:</b> {financials['defects_avoided']:,.0f}</p>
-            <p><b>Annual cost savings:</b> ${financials['annual_savings']:,.0f}</p>
-            <p><b>Project investment:</b> ${financials['investment']:,.0f}</p>
-            <p><b>Return on Investment:</b> {financials['roi']:.0f}%</p>
-            <p><b>Payback period:</b> {financials['payback_months']:.1f} months</p>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            # AUTO-GENERATED PROJECT PLAN
-            st.markdown("---")
-            st.markdown("## 📋 AUTO-GENERATED PROJECT PLAN")
-            
-            timeline = generate_auto_timeline('Manufacturing')
-            
-            st.markdown(f"""
-            <div class="interpretation-box">
-            <h3 style="color: white;">🎯 Recommended DMAIC Project</h3>
-            <p style="color: white; font-size: 1.2em;"><b>Project Name:</b> Improve {ctq_col} Process Capability</p>
-            <p style="color: white;"><b>Goal:</b> Reduce DPMO from {dpmo:,.0f} to {target_dpmo:,.0f} ({target_sigma:.1f} Sigma)</p>
-            <p style="color: white;"><b>Expected Timeline:</b> {timeline['total_weeks']} weeks ({timeline['total_months']} months)</p>
-            <p style="color: white;"><b>Expected Savings:</b> ${financials['annual_savings']:,.0f} per year</p>
-            <p style="color: white;"><b>ROI:</b> {financials['roi']:.0f}%</p>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            # Timeline breakdown
-            st.markdown("### 📅 Project Timeline")
-            
-            current_date = datetime.now()
-            for phase, weeks in timeline['phases'].items():
-                end_date = current_date + timedelta(weeks=weeks)
-                
-                st.markdown(f"""
-                <div class="step-box">
-                <h4>{phase} Phase</h4>
-                <p><b>Duration:</b> {weeks} weeks</p>
-                <p><b>Start:</b> {current_date.strftime('%Y-%m-%d')} | <b>End:</b> {end_date.strftime('%Y-%m-%d')}</p>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                current_date = end_date
-            
             # Charts
             st.markdown("---")
             st.markdown("### 📊 Process Visualization")
@@ -618,8 +720,11 @@ if uploaded_file is not None:
                 marker_color='lightblue'
             ))
             
-            x_range = np.linspace(data.min(), data.max(), 200)
-            y_normal = stats.norm.pdf(x_range, mean, std) * len(data) * (data.max() - data.min()) / 40
+            # Cosmetic overlay: 50 points is visually identical to a finer grid
+            arr = data.to_numpy()
+            lo, hi = arr.min(), arr.max()
+            x_range = np.linspace(lo, hi, 50)
+            y_normal = stats.norm.pdf(x_range, mean, std) * len(data) * (hi - lo) / 40
             
             fig_hist.add_trace(go.Scatter(
                 x=x_range,
@@ -629,14 +734,12 @@ if uploaded_file is not None:
                 line=dict(color='red', width=2)
             ))
             
-            fig_hist.add_vline(x=lsl, line_dash="dash", line_color="red", line_width=3,
-                              annotation_text="LSL")
-            fig_hist.add_vline(x=usl, line_dash="dash", line_color="red", line_width=3,
-                              annotation_text="USL")
-            fig_hist.add_vline(x=target, line_dash="dash", line_color="green", line_width=2,
-                              annotation_text="Target")
-            fig_hist.add_vline(x=mean, line_color="blue", line_width=2,
-                              annotation_text="Mean")
+            add_reference_lines(fig_hist, 'x', [
+                (lsl, "LSL", dict(color="red", dash="dash", width=3)),
+                (usl, "USL", dict(color="red", dash="dash", width=3)),
+                (target, "Target", dict(color="green", dash="dash", width=2)),
+                (mean, "Mean", dict(color="blue", width=2)),
+            ])
             
             fig_hist.update_layout(
                 title="Process Distribution vs Specification Limits",
@@ -646,39 +749,40 @@ if uploaded_file is not None:
                 showlegend=True
             )
             
-            st.plotly_chart(fig_hist, use_container_width=True)
+            st.plotly_chart(fig_hist, use_container_width=True, key="cap_hist")
             
             # Control Chart
             st.markdown("### 📈 Process Stability Check (Control Chart)")
             
-            mr = data.diff().abs()
-            mr_mean = mr.mean()
+            # Work on the raw buffer; masking the Series would re-align the index
+            values = np.ascontiguousarray(data, dtype=np.float64)
+            
+            mr_mean = np.abs(np.diff(values)).mean()
             ucl = mean + 2.66 * mr_mean
             lcl = mean - 2.66 * mr_mean
             
-            out_of_control = (data > ucl) | (data < lcl)
+            out_of_control = (values > ucl) | (values < lcl)
+            ooc_idx = np.flatnonzero(out_of_control)
             
             fig_control = go.Figure()
             
-            fig_control.add_trace(go.Scatter(
-                y=data,
-                mode='lines+markers',
+            fig_control.add_trace(_make_line(
+                y=values,
                 name='Individual Values',
                 line=dict(color='blue'),
                 marker=dict(size=6)
             ))
             
-            fig_control.add_hline(y=ucl, line_dash="dash", line_color="red", 
-                                 annotation_text="UCL")
-            fig_control.add_hline(y=mean, line_color="green", 
-                                 annotation_text="Mean")
-            fig_control.add_hline(y=lcl, line_dash="dash", line_color="red", 
-                                 annotation_text="LCL")
-            
-            if out_of_control.any():
-                fig_control.add_trace(go.Scatter(
-                    x=data[out_of_control].index,
-                    y=data[out_of_control],
+            add_reference_lines(fig_control, 'y', [
+                (ucl, "UCL", dict(color="red", dash="dash")),
+                (mean, "Mean", dict(color="green")),
+                (lcl, "LCL", dict(color="red", dash="dash")),
+            ])
+            
+            if ooc_idx.size:
+                fig_control.add_trace(_make_line(
+                    x=ooc_idx,
+                    y=values[ooc_idx],
                     mode='markers',
                     name='Out of Control',
                     marker=dict(color='red', size=12, symbol='x', line=dict(width=2))
@@ -691,12 +795,12 @@ if uploaded_file is not None:
                 height=500
             )
             
-            st.plotly_chart(fig_control, use_container_width=True)
+            st.plotly_chart(fig_control, use_container_width=True, key="imr_chart")
             
-            if out_of_control.any():
+            if ooc_idx.size:
                 st.markdown(f"""
                 <div class="warning-box">
-                <p><b>⚠️ {out_of_control.sum()} out-of-control points detected</b></p>
+                <p><b>⚠️ {ooc_idx.size} out-of-control points detected</b></p>
                 <p>Process shows special cause variation. Investigation required before process improvement.</p>
                 <p><b>Recommended action:</b> Identify and remove special causes, then recollect baseline data.</p>
                 </div>
@@ -710,46 +814,7 @@ if uploaded_file is not None:
                 </div>
                 """, unsafe_allow_html=True)
             
-            # Next Steps
-            st.markdown("---")
-            st.markdown("## ✅ Recommended Next Steps")
-            
-            next_steps = [
-                {
-                    'step': '1. Get Management Approval',
-                    'detail': f'Present business case: ${financials["annual_savings"]:,.0f} annual savings with {financials["roi"]:.0f}% ROI',
-                    'timeline': 'Week 1'
-                },
-                {
-                    'step': '2. Form Project Team',
-                    'detail': 'Identify Black Belt, process owner, and team members (5-7 people recommended)',
-                    'timeline': 'Week 1'
-                },
-                {
-                    'step': '3. Launch Define Phase',
-                    'detail': 'Create project charter, SIPOC diagram, and stakeholder analysis',
-                    'timeline': 'Weeks 1-3'
-                },
-                {
-                    'step': '4. Validate Measurement System',
-                    'detail': 'Conduct Gage R&R study to ensure measurement reliability',
-                    'timeline': 'Weeks 4-5'
-                },
-                {
-                    'step': '5. Begin Root Cause Analysis',
-                    'detail': 'Use Fishbone, 5 Whys, and statistical analysis to identify critical Xs',
-                    'timeline': 'Weeks 6-9'
-                }
-            ]
-            
-            for step_info in next_steps:
-                st.markdown(f"""
-                <div class="recommendation-box">
-                <h4>{step_info['step']}</h4>
-                <p>{step_info['detail']}</p>
-                <p><b>Timeline:</b> {step_info['timeline']}</p>
-                </div>
-                """, unsafe_allow_html=True)
+            _render_improvement_plan(ctq_col, sigma_level, dpmo)
         
         # ═══════════════════════════════════════════════════════════════════════
         # DISCRETE DATA ANALYSIS
@@ -786,7 +851,7 @@ if uploaded_file is not None:
                 col3.metric("Total Defects", f"{total_defects:,.0f}")
                 col4.metric("Yield", f"{yield_pct:.2f}%")
                 
-                # Interpretation
+                # Interpretation and required action (one element)
                 sigma_interp = interpret_sigma_level(sigma_level, dpmo)
                 
                 st.markdown(f"""
@@ -798,9 +863,7 @@ if uploaded_file is not None:
                 <hr style="border-color: rgba(255,255,255,0.3);">
                 <p style="color: white;"><b>Business Impact:</b> {sigma_interp['business_impact']}</p>
                 </div>
-                """, unsafe_allow_html=True)
                 
-                st.markdown(f"""
                 <div class="recommendation-box">
                 <h3>💡 Required Action</h3>
                 <p><b>{sigma_interp['action']}</b></p>
@@ -820,23 +883,25 @@ if uploaded_file is not None:
                 
                 fig_pchart = go.Figure()
                 
-                fig_pchart.add_trace(go.Scatter(
+                fig_pchart.add_trace(_make_line(
                     y=df['proportion'],
-                    mode='lines+markers',
                     name='Proportion Defective',
                     line=dict(color='blue')
                 ))
                 
-                fig_pchart.add_hline(y=ucl_p, line_dash="dash", line_color="red", annotation_text="UCL")
-                fig_pchart.add_hline(y=p_bar, line_color="green", annotation_text="Mean")
-                fig_pchart.add_hline(y=lcl_p, line_dash="dash", line_color="red", annotation_text="LCL")
+                add_reference_lines(fig_pchart, 'y', [
+                    (ucl_p, "UCL", dict(color="red", dash="dash")),
+                    (p_bar, "Mean", dict(color="green")),
+                    (lcl_p, "LCL", dict(color="red", dash="dash")),
+                ])
                 
-                out_of_control_p = (df['proportion'] > ucl_p) | (df['proportion'] < lcl_p)
+                proportion = df['proportion'].to_numpy()
+                ooc_idx_p = np.flatnonzero((proportion > ucl_p) | (proportion < lcl_p))
                 
-                if out_of_control_p.any():
-                    fig_pchart.add_trace(go.Scatter(
-                        x=df[out_of_control_p].index,
-                        y=df.loc[out_of_control_p, 'proportion'],
+                if ooc_idx_p.size:
+                    fig_pchart.add_trace(_make_line(
+                        x=ooc_idx_p,
+                        y=proportion[ooc_idx_p],
                         mode='markers',
                         name='Out of Control',
                         marker=dict(color='red', size=12, symbol='x')
@@ -849,29 +914,9 @@ if uploaded_file is not None:
                     height=500
                 )
                 
-                st.plotly_chart(fig_pchart, use_container_width=True)
+                st.plotly_chart(fig_pchart, use_container_width=True, key="p_chart")
                 
-                # Auto project plan for discrete
-                st.markdown("---")
-                st.markdown("## 📋 AUTO-GENERATED IMPROVEMENT PROJECT")
-                
-                annual_volume = st.number_input("Annual Volume:", value=1000000, step=100000)
-                target_sigma = st.slider("Target Sigma:", min_value=float(max(sigma_level, 3)), max_value=6.0, value=float(min(sigma_level+1, 6)), step=0.5)
-                
-                target_dpmo_discrete = (1 - stats.norm.cdf(target_sigma - 1.5)) * 1_000_000
-                financials_discrete = calculate_financial_impact(dpmo, target_dpmo_discrete, annual_volume)
-                
-                timeline_discrete = generate_auto_timeline('Manufacturing')
-                
-                st.markdown(f"""
-                <div class="interpretation-box">
-                <h3 style="color: white;">🎯 Defect Reduction Project</h3>
-                <p style="color: white; font-size: 1.2em;"><b>Goal:</b> Reduce defect rate from {dpmo:,.0f} to {target_dpmo_discrete:,.0f} DPMO</p>
-                <p style="color: white;"><b>Timeline:</b> {timeline_discrete['total_weeks']} weeks</p>
-                <p style="color: white;"><b>Expected Savings:</b> ${financials_discrete['annual_savings']:,.0f}/year</p>
-                <p style="color: white;"><b>ROI:</b> {financials_discrete['roi']:.0f}%</p>
-                </div>
-                """, unsafe_allow_html=True)
+                _render_discrete_plan(sigma_level, dpmo)
         
         else:
             st.warning("⚠️ Could not automatically detect data type. Please ensure your data has clear column names (e.g., 'Defects', 'Opportunities', or measurement names)")
@@ -10,11 +10,8 @@ import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from scipy import stats
-from scipy.stats import normaltest, shapiro
-import statsmodels.api as sm
-from statsmodels.formula.api import ols
-from statsmodels.stats.anova import anova_lm
+from scipy.special import chdtrc, fdtrc, ndtr, ndtri, stdtr
+from six_sigma_common import add_reference_lines, load_uploaded_data
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -38,6 +35,372 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
+# Cached computations (keyed on the data, so reruns with the same column reuse them).
+# A cached go.Figure skips the computation and trace assembly on a hit, but unpickling
+# re-runs the Figure constructor and its validation, so a hit costs roughly half a rebuild
+@st.cache_data(show_spinner=False)
+def load_compact_data(file_bytes, file_name):
+    """Parsed upload with compact column types (cached on file content)"""
+    df = load_uploaded_data(file_bytes, file_name)
+    
+    # Repeated-label text columns become categoricals once, so grouping hashes integer codes
+    for col in df.select_dtypes(include=['object', 'string']).columns:
+        if df[col].nunique() < 0.5 * len(df):
+            df[col] = df[col].astype('category')
+    
+    # Integer columns stored at the smallest lossless width; floats stay float64,
+    # since float32 would shift readings that sit on a spec limit
+    for col in df.select_dtypes(include=['integer']).columns:
+        df[col] = pd.to_numeric(df[col], downcast='integer')
+    return df
+
+@st.cache_data(show_spinner=False)
+def normality_tests(values):
+    """Anderson-Darling statistic with its 5% critical value, plus a second test's name and p-value"""
+    # scipy.stats takes most of a second to import; only the continuous analysis needs it
+    from scipy import stats
+    from scipy.stats import normaltest, shapiro
+    
+    anderson_result = stats.anderson(values)
+    # Shapiro-Wilk p-values are unreliable from 5000 points; the moment-based
+    # D'Agostino K² test needs no sort and suits large samples
+    if len(values) < 5000:
+        test_name, p_value = "Shapiro-Wilk", shapiro(values)[1]
+    else:
+        test_name, p_value = "D'Agostino K²", normaltest(values).pvalue
+    return anderson_result.statistic, anderson_result.critical_values[2], test_name, p_value
+
+@st.cache_data(show_spinner=False)
+def normal_qq(values):
+    """Normal probability plot points and least-squares fit, from one sort and a vectorized ndtri"""
+    osr = np.sort(values)
+    n = osr.size
+    osm = ndtri((np.arange(1, n + 1) - 0.375) / (n + 0.25))  # Blom plotting positions
+    
+    dx = osm - osm.mean()
+    dy = osr - osr.mean()
+    sxy, sxx, syy = dx @ dy, dx @ dx, dy @ dy
+    slope = sxy / sxx
+    intercept = osr.mean() - slope * osm.mean()
+    r = sxy / np.sqrt(sxx * syy)
+    return osm, osr, slope, intercept, r
+
+@st.cache_data(show_spinner=False)
+def normal_qq_figure(values):
+    """Normal probability plot figure with its least-squares reference line"""
+    osm, osr, slope, intercept, r = normal_qq(values)
+    n_qq = osr.size
+    r2 = r * r
+    
+    # The fit uses every point; plot at most 300 evenly spaced ranks (ends included)
+    shown = np.unique(np.linspace(0, n_qq - 1, min(n_qq, 300)).astype(np.int64))
+    # Fit stays in float64; plotted coordinates only need float32 (half the payload)
+    x_qq = osm.astype(np.float32)
+    
+    fig_prob = go.Figure()
+    fig_prob.add_trace(go.Scattergl(
+        x=x_qq[shown],
+        y=osr[shown].astype(np.float32),
+        mode='markers',
+        name='Actual',
+        marker=dict(color='blue')
+    ))
+    
+    # A straight line only needs its endpoints
+    x_line = np.array([osm[0], osm[-1]])
+    fig_prob.add_trace(go.Scattergl(
+        x=x_line.astype(np.float32),
+        y=(slope * x_line + intercept).astype(np.float32),
+        mode='lines',
+        name='Theoretical Normal',
+        line=dict(color='red')
+    ))
+    
+    fig_prob.update_layout(
+        title=f"Normal Probability Plot (R² = {r2:.4f})",
+        xaxis_title="Theoretical Quantiles",
+        yaxis_title="Sample Quantiles",
+        height=500
+    )
+    return fig_prob
+
+@st.cache_data(show_spinner=False)
+def discrete_metrics(defects, sample_sizes):
+    """DPMO, yield, Sigma levels and P-chart limits from per-sample defect counts and sample sizes"""
+    total_defects = np.nansum(defects)
+    total_opportunities = np.nansum(sample_sizes)
+    dpo = total_defects / total_opportunities
+    
+    # Sigma calculation (accounting for 1.5 sigma shift)
+    if dpo >= 1:
+        sigma_lt = 0
+        sigma_st = 0
+    else:
+        sigma_lt = ndtri(1 - dpo)
+        sigma_st = sigma_lt + 1.5
+    
+    proportion = defects / sample_sizes
+    p_bar = np.nanmean(proportion)
+    n_bar = np.nanmean(sample_sizes)
+    se_p = np.sqrt(p_bar * (1 - p_bar) / n_bar)
+    ucl_p = p_bar + 3 * se_p
+    lcl_p = max(0, p_bar - 3 * se_p)
+    
+    return {
+        'total_defects': total_defects,
+        'dpu': total_defects / defects.size,  # Defects per unit
+        'dpmo': dpo * 1_000_000,
+        'dpo': dpo,
+        'yield_pct': (1 - dpo) * 100,
+        'sigma_lt': sigma_lt,
+        'sigma_st': sigma_st,
+        'proportion': proportion,
+        'p_bar': p_bar,
+        'ucl_p': ucl_p,
+        'lcl_p': lcl_p,
+        'ooc_idx': np.flatnonzero((proportion > ucl_p) | (proportion < lcl_p))
+    }
+
+@st.cache_data(show_spinner=False)
+def capability_metrics(values, usl, lsl):
+    """Descriptive statistics, capability indices, defect counts and Sigma levels for a CTQ sample"""
+    mean = values.mean()
+    std = values.std(ddof=1)
+    
+    # Spec width and the two one-sided distances, scaled in one array operation
+    cp, cpu, cpl = np.array([(usl - lsl) / 2, usl - mean, mean - lsl]) / (3 * std)
+    
+    # Long-term capability uses the same overall std here, so it matches short-term
+    pp, ppu, ppl = cp, cpu, cpl
+    
+    # Calculate defects
+    defects = np.count_nonzero(values > usl) + np.count_nonzero(values < lsl)
+    
+    # Estimated DPMO from normal distribution
+    prob_above = ndtr((mean - usl) / std)  # upper tail by symmetry
+    prob_below = ndtr((lsl - mean) / std)
+    dpmo_est = (prob_above + prob_below) * 1_000_000
+    
+    # Sigma levels
+    if dpmo_est >= 1000000:
+        sigma_lt = 0
+        sigma_st = 0
+    else:
+        sigma_lt = ndtri(1 - dpmo_est/1_000_000)
+        sigma_st = sigma_lt + 1.5
+    
+    return {
+        'mean': mean,
+        'std': std,
+        'median': np.median(values),
+        'min': values.min(),
+        'max': values.max(),
+        'cp': cp,
+        'cpu': cpu,
+        'cpl': cpl,
+        'cpk': min(cpu, cpl),
+        'pp': pp,
+        'ppk': min(ppu, ppl),
+        'defects': defects,
+        'dpmo_actual': (defects / values.size) * 1_000_000,
+        'dpmo_est': dpmo_est,
+        'sigma_lt': sigma_lt,
+        'sigma_st': sigma_st
+    }
+
+@st.cache_data(show_spinner=False)
+def imr_chart(individuals, mean, ctq_col):
+    """I-MR control chart figure and the out-of-control sample indices for a CTQ column"""
+    moving_range = np.empty_like(individuals)
+    moving_range[0] = np.nan
+    np.abs(np.subtract(individuals[1:], individuals[:-1]), out=moving_range[1:])
+    
+    # Moving Range chart
+    mr_mean = np.nanmean(moving_range)
+    ucl_mr = 3.267 * mr_mean
+    lcl_mr = 0
+    
+    # Individual chart
+    ucl_i = mean + 2.66 * mr_mean
+    lcl_i = mean - 2.66 * mr_mean
+    ooc_i = np.flatnonzero((individuals > ucl_i) | (individuals < lcl_i))
+    
+    # Limits use every sample; large charts draw an even stride plus every OOC point
+    sample_no = plot_indices(individuals.size, ooc_i)
+    
+    fig_control = make_subplots(
+        rows=2, cols=1,
+        subplot_titles=("Individual Chart", "Moving Range Chart"),
+        vertical_spacing=0.15
+    )
+    
+    # Individual chart
+    fig_control.add_trace(
+        go.Scatter(x=sample_no, y=individuals[sample_no],
+                  mode='lines+markers', name='Individual Values',
+                  line=dict(color='blue')),
+        row=1, col=1
+    )
+    
+    # Limits as layout lines, not N-point traces
+    add_reference_lines(fig_control, 'y', [
+        (ucl_i, "UCL", dict(color="red", dash="dash")),
+        (mean, "Mean", dict(color="green")),
+        (lcl_i, "LCL", dict(color="red", dash="dash")),
+    ])
+    
+    if ooc_i.size:
+        fig_control.add_trace(
+            go.Scatter(x=ooc_i,
+                      y=individuals[ooc_i],
+                      mode='markers', name='Out of Control',
+                      marker=dict(color='red', size=10, symbol='x')),
+            row=1, col=1
+        )
+    
+    # Moving Range chart
+    fig_control.add_trace(
+        go.Scatter(x=sample_no, y=moving_range[sample_no],
+                  mode='lines+markers', name='Moving Range',
+                  line=dict(color='purple')),
+        row=2, col=1
+    )
+    
+    add_reference_lines(fig_control, 'y', [
+        (ucl_mr, "UCL (MR)", dict(color="red", dash="dash")),
+        (mr_mean, "Mean (MR)", dict(color="green")),
+    ], xref='x2', yref='y2')
+    
+    fig_control.update_layout(height=800, showlegend=False)
+    fig_control.update_xaxes(title_text="Sample Number", row=2, col=1)
+    fig_control.update_yaxes(title_text=ctq_col, row=1, col=1)
+    fig_control.update_yaxes(title_text="Moving Range", row=2, col=1)
+    return fig_control, ooc_i
+
+def _sort_by_code(values, codes, n_groups):
+    """CTQ values (NaNs dropped) stably sorted by factor code, with the count per code"""
+    valid = (codes >= 0) & ~np.isnan(values)
+    valid_codes = codes[valid]
+    order = np.argsort(valid_codes, kind='stable')
+    return values[valid][order], np.bincount(valid_codes, minlength=n_groups)
+
+@st.cache_data(show_spinner=False)
+def anova_groups(values, codes, n_groups):
+    """CTQ values split by factor code (NaNs dropped), one array per level in code order"""
+    ordered, counts = _sort_by_code(values, codes, n_groups)
+    return np.split(ordered, np.cumsum(counts)[:-1])
+
+@st.cache_data(show_spinner=False)
+def group_stats(values, codes, n_groups):
+    """Per-level count, mean and sample std of the CTQ from one pass over the code-sorted values"""
+    ordered, counts = _sort_by_code(values, codes, n_groups)
+    starts = np.cumsum(counts) - counts
+    filled = counts > 0
+    means = np.full(n_groups, np.nan)
+    sq_dev = np.zeros(n_groups)
+    if ordered.size:
+        means[filled] = np.add.reduceat(ordered, starts[filled]) / counts[filled]
+        centered = ordered - np.repeat(means[filled], counts[filled])
+        sq_dev[filled] = np.add.reduceat(centered * centered, starts[filled])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stds = np.where(counts > 1, np.sqrt(sq_dev / (counts - 1)), np.nan)
+    return counts, means, stds
+
+@st.cache_data(show_spinner=False)
+def run_anova(values, codes, n_groups):
+    """One-way ANOVA (F, p) across factor levels, or None when a level has fewer than two values"""
+    counts, means, stds = group_stats(values, codes, n_groups)
+    if counts.size > 1 and (counts > 1).all():
+        # Sums of squares straight from the per-level summaries, no second pass over the data
+        grand_mean = (counts @ means) / counts.sum()
+        ss_between = counts @ (means - grand_mean) ** 2
+        ss_within = (counts - 1) @ (stds * stds)
+        df_between, df_within = n_groups - 1, counts.sum() - n_groups
+        f_stat = (ss_between / df_between) / (ss_within / df_within)
+        return f_stat, fdtrc(df_between, df_within, f_stat)
+    return None
+
+@st.cache_data(show_spinner=False)
+def factor_box_figure(values, codes, levels, factor_col, ctq_col):
+    """Box plot of the CTQ for each factor level, drawn from precomputed quartiles and Tukey fences"""
+    fig_box = go.Figure()
+    palette = px.colors.qualitative.Plotly
+    for i, (level, group) in enumerate(zip(levels, anova_groups(values, codes, len(levels)))):
+        if group.size == 0:
+            continue
+        q1, median, q3 = np.quantile(group, [0.25, 0.5, 0.75])
+        reach = 1.5 * (q3 - q1)
+        inside = (group >= q1 - reach) & (group <= q3 + reach)
+        color = palette[i % len(palette)]
+        fig_box.add_trace(go.Box(
+            x=[level], q1=[q1], median=[median], q3=[q3],
+            lowerfence=[group[inside].min()], upperfence=[group[inside].max()],
+            name=level, legendgroup=level, marker_color=color
+        ))
+        outliers = group[~inside]
+        if outliers.size:
+            fig_box.add_trace(go.Scattergl(
+                x=[level] * outliers.size, y=outliers, mode='markers',
+                name=level, legendgroup=level, showlegend=False, marker_color=color
+            ))
+    fig_box.update_layout(title=f"{ctq_col} by {factor_col}", xaxis_title=factor_col, yaxis_title=ctq_col)
+    return fig_box
+
+@st.cache_data(show_spinner=False)
+def factor_scatter_figure(x, y, factor_col, ctq_col):
+    """Scatter of the CTQ against a numeric factor with its least-squares line"""
+    intercept, slope, _, _ = simple_ols(x, y)
+    x_line = np.array([x.min(), x.max()])
+    
+    fig_scatter = go.Figure()
+    # Fit in float64; plotted coordinates only need float32 (half the payload)
+    fig_scatter.add_trace(go.Scattergl(x=x.astype(np.float32), y=y.astype(np.float32), mode='markers', name=ctq_col))
+    fig_scatter.add_trace(go.Scatter(x=x_line, y=intercept + slope * x_line, mode='lines', name='OLS trendline'))
+    fig_scatter.update_layout(title=f"{ctq_col} vs {factor_col}", xaxis_title=factor_col,
+                              yaxis_title=ctq_col, showlegend=False)
+    return fig_scatter
+
+# Plot helpers
+_MAX_TRACE_POINTS = 20_000
+
+def plot_indices(n, keep, cap=_MAX_TRACE_POINTS):
+    """Sample positions to draw: all of them up to cap, else an even stride merged with keep"""
+    if n <= cap:
+        return np.arange(n)
+    return np.union1d(np.linspace(0, n - 1, cap).astype(np.int64), keep)
+
+# Test helpers
+def factor_codes(column):
+    """Integer codes and sorted level labels of a factor column (categoricals reuse their stored codes)"""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.cat.codes.to_numpy(), column.cat.categories
+    return pd.factorize(column, sort=True)
+
+def chi2_independence(observed):
+    """Pearson chi-square test on a contingency table, Yates-corrected at one dof like chi2_contingency"""
+    observed = observed.astype(np.float64)
+    expected = observed.sum(axis=1, keepdims=True) * observed.sum(axis=0, keepdims=True) / observed.sum()
+    dof = (observed.shape[0] - 1) * (observed.shape[1] - 1)
+    if dof == 0:
+        return 0.0, 1.0, dof
+    if dof == 1:
+        diff = expected - observed
+        observed = observed + np.sign(diff) * np.minimum(0.5, np.abs(diff))
+    chi2 = ((observed - expected) ** 2 / expected).sum()
+    return chi2, chdtrc(dof, chi2), dof
+
+@st.cache_data(show_spinner=False)
+def simple_ols(x, y):
+    """Intercept, slope, correlation and two-sided slope p-value of a one-factor least-squares fit"""
+    dx = x - x.mean()
+    dy = y - y.mean()
+    sxx, sxy, syy = dx @ dx, dx @ dy, dy @ dy
+    slope = sxy / sxx
+    dof = x.size - 2
+    resid = dy - slope * dx
+    t_stat = slope / np.sqrt((resid @ resid) / dof / sxx)
+    return y.mean() - slope * x.mean(), slope, sxy / np.sqrt(sxx * syy), 2 * stdtr(dof, -abs(t_stat))
+
 # Title and Introduction
 st.title("🚀 Six Sigma Black Belt Auto-Pilot")
 st.markdown("**Upload your data → Get instant Sigma level, root causes, and professional charts**")
@@ -76,10 +439,7 @@ if uploaded_file is not None:
     
     # Load data
     try:
-        if uploaded_file.name.endswith('.csv'):
-            df = pd.read_csv(uploaded_file)
-        else:
-            df = pd.read_excel(uploaded_file)
+        df = load_compact_data(uploaded_file.getvalue(), uploaded_file.name)
         
         st.success(f"✅ File loaded successfully! {len(df)} rows, {len(df.columns)} columns")
         
@@ -101,9 +461,18 @@ if uploaded_file is not None:
     
     # Auto-detect column types
     numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-    date_cols = [col for col in df.columns if any(x in col.lower() for x in ['date', 'time', 'day', 'month', 'year'])]
-    defect_cols = [col for col in df.columns if any(x in col.lower() for x in ['defect', 'bad', 'ng', 'fail', 'rework', 'reject', 'error'])]
-    opportunity_cols = [col for col in df.columns if any(x in col.lower() for x in ['opportunity', 'opportun', 'sample', 'unit', 'total'])]
+    date_keywords = ('date', 'time', 'day', 'month', 'year')
+    defect_keywords = ('defect', 'bad', 'ng', 'fail', 'rework', 'reject', 'error')
+    opportunity_keywords = ('opportunity', 'opportun', 'sample', 'unit', 'total')
+    date_cols, defect_cols, opportunity_cols = [], [], []
+    for col in df.columns:
+        col_lower = col.lower()
+        if any(x in col_lower for x in date_keywords):
+            date_cols.append(col)
+        if any(x in col_lower for x in defect_keywords):
+            defect_cols.append(col)
+        if any(x in col_lower for x in opportunity_keywords):
+            opportunity_cols.append(col)
     
     # Determine data type
     st.header("🔍 Step 1: Data Type Detection")
@@ -151,43 +520,32 @@ if uploaded_file is not None:
             
             # Calculate metrics
             try:
-                total_defects = df[defect_col].sum()
-                total_opportunities = df[opportunity_col].sum()
-                
-                dpu = total_defects / len(df)  # Defects per unit
-                dpmo = (total_defects / total_opportunities) * 1_000_000
-                dpo = total_defects / total_opportunities
-                yield_pct = (1 - dpo) * 100
-                
-                # Sigma calculation (accounting for 1.5 sigma shift)
-                if dpo >= 1:
-                    sigma_lt = 0
-                    sigma_st = 0
-                else:
-                    sigma_lt = stats.norm.ppf(1 - dpo)
-                    sigma_st = sigma_lt + 1.5
+                defects_arr = df[defect_col].to_numpy(dtype=np.float64)
+                sample_sizes = df[opportunity_col].to_numpy(dtype=np.float64)
+                metrics = discrete_metrics(defects_arr, sample_sizes)
+                total_defects, dpu = metrics['total_defects'], metrics['dpu']
+                dpmo, dpo, yield_pct = metrics['dpmo'], metrics['dpo'], metrics['yield_pct']
+                sigma_lt, sigma_st = metrics['sigma_lt'], metrics['sigma_st']
                 
                 # Display key metrics
                 st.markdown("### 🎯 Key Performance Metrics")
                 
-                col1, col2, col3, col4 = st.columns(4)
-                
-                with col1:
-                    st.metric("Total Defects", f"{total_defects:,.0f}")
-                    st.metric("DPU", f"{dpu:.4f}")
-                
-                with col2:
-                    st.metric("DPMO", f"{dpmo:,.0f}")
-                    st.metric("DPO", f"{dpo:.6f}")
-                
-                with col3:
-                    st.metric("Yield %", f"{yield_pct:.3f}%")
-                    st.metric("First Pass Yield", f"{yield_pct:.2f}%")
-                
-                with col4:
-                    sigma_color = "🟢" if sigma_st >= 4 else "🟡" if sigma_st >= 3 else "🔴"
-                    st.metric("Sigma Level (ST)", f"{sigma_color} {sigma_st:.2f}")
-                    st.metric("Sigma Level (LT)", f"{sigma_lt:.2f}")
+                sigma_color = "🟢" if sigma_st >= 4 else "🟡" if sigma_st >= 3 else "🔴"
+                
+                # Four columns of two, in the original order
+                key_metrics = [
+                    ("Total Defects", f"{total_defects:,.0f}"),
+                    ("DPU", f"{dpu:.4f}"),
+                    ("DPMO", f"{dpmo:,.0f}"),
+                    ("DPO", f"{dpo:.6f}"),
+                    ("Yield %", f"{yield_pct:.3f}%"),
+                    ("First Pass Yield", f"{yield_pct:.2f}%"),
+                    ("Sigma Level (ST)", f"{sigma_color} {sigma_st:.2f}"),
+                    ("Sigma Level (LT)", f"{sigma_lt:.2f}")
+                ]
+                cols = st.columns(4)
+                for i, (label, value) in enumerate(key_metrics):
+                    cols[i // 2].metric(label, value)
                 
                 # Sigma interpretation
                 st.markdown("### 📈 Sigma Level Interpretation")
@@ -210,55 +568,34 @@ if uploaded_file is not None:
                 # Control chart (P-chart)
                 st.markdown("### 📉 P-Chart (Proportion Defective)")
                 
-                df['proportion'] = df[defect_col] / df[opportunity_col]
-                p_bar = df['proportion'].mean()
-                n_bar = df[opportunity_col].mean()
+                proportion, p_bar = metrics['proportion'], metrics['p_bar']
+                ucl_p, lcl_p, ooc_idx = metrics['ucl_p'], metrics['lcl_p'], metrics['ooc_idx']
                 
-                ucl_p = p_bar + 3 * np.sqrt(p_bar * (1 - p_bar) / n_bar)
-                lcl_p = max(0, p_bar - 3 * np.sqrt(p_bar * (1 - p_bar) / n_bar))
+                # Limits use every sample; large charts draw an even stride plus every OOC point
+                sample_no = plot_indices(proportion.size, ooc_idx)
                 
                 fig_pchart = go.Figure()
                 
                 fig_pchart.add_trace(go.Scatter(
-                    x=list(range(len(df))),
-                    y=df['proportion'],
+                    x=sample_no,
+                    y=proportion[sample_no],
                     mode='lines+markers',
                     name='Proportion Defective',
                     line=dict(color='blue'),
                     marker=dict(size=6)
                 ))
                 
-                fig_pchart.add_trace(go.Scatter(
-                    x=list(range(len(df))),
-                    y=[ucl_p] * len(df),
-                    mode='lines',
-                    name='UCL',
-                    line=dict(color='red', dash='dash')
-                ))
-                
-                fig_pchart.add_trace(go.Scatter(
-                    x=list(range(len(df))),
-                    y=[p_bar] * len(df),
-                    mode='lines',
-                    name='Center Line',
-                    line=dict(color='green', dash='dash')
-                ))
-                
-                fig_pchart.add_trace(go.Scatter(
-                    x=list(range(len(df))),
-                    y=[lcl_p] * len(df),
-                    mode='lines',
-                    name='LCL',
-                    line=dict(color='red', dash='dash')
-                ))
-                
-                # Detect out-of-control points
-                out_of_control = (df['proportion'] > ucl_p) | (df['proportion'] < lcl_p)
+                # Limits as layout lines, not N-point traces
+                add_reference_lines(fig_pchart, 'y', [
+                    (ucl_p, "UCL", dict(color="red", dash="dash")),
+                    (p_bar, "Center Line", dict(color="green", dash="dash")),
+                    (lcl_p, "LCL", dict(color="red", dash="dash")),
+                ])
                 
-                if out_of_control.any():
+                if ooc_idx.size:
                     fig_pchart.add_trace(go.Scatter(
-                        x=df[out_of_control].index,
-                        y=df.loc[out_of_control, 'proportion'],
+                        x=ooc_idx,
+                        y=proportion[ooc_idx],
                         mode='markers',
                         name='Out of Control',
                         marker=dict(color='red', size=12, symbol='x')
@@ -275,14 +612,14 @@ if uploaded_file is not None:
                 st.plotly_chart(fig_pchart, use_container_width=True)
                 
                 # Control chart interpretation
-                if out_of_control.any():
-                    st.warning(f"⚠️ **{out_of_control.sum()} out-of-control points detected!** These indicate special cause variation requiring investigation.")
-                    st.dataframe(df[out_of_control][[defect_col, opportunity_col, 'proportion']])
+                if ooc_idx.size:
+                    st.warning(f"⚠️ **{ooc_idx.size} out-of-control points detected!** These indicate special cause variation requiring investigation.")
+                    st.dataframe(df.iloc[ooc_idx][[defect_col, opportunity_col]].assign(proportion=proportion[ooc_idx]))
                 else:
                     st.success("✅ Process is in statistical control - only common cause variation present")
                 
                 # Pareto analysis if there are categories
-                categorical_cols = df.select_dtypes(include=['object']).columns.tolist()
+                categorical_cols = df.select_dtypes(include=['object', 'string', 'category']).columns.tolist()
                 
                 if categorical_cols:
                     st.markdown("### 📊 Root Cause Analysis")
@@ -291,18 +628,24 @@ if uploaded_file is not None:
                     
                     if category_col:
                         # Pareto chart
-                        pareto_data = df.groupby(category_col)[defect_col].sum().sort_values(ascending=False)
-                        pareto_pct = (pareto_data / pareto_data.sum() * 100).cumsum()
+                        # Defects per category from integer codes (categorical columns reuse theirs)
+                        codes, labels = pd.factorize(df[category_col])
+                        counted = (codes >= 0) & ~np.isnan(defects_arr)
+                        category_defects = np.bincount(codes[counted], weights=defects_arr[counted], minlength=len(labels))
+                        order = np.argsort(-category_defects, kind='stable')
+                        pareto_labels = np.asarray(labels)[order]
+                        pareto_counts = category_defects[order]
+                        pareto_pct = np.cumsum(pareto_counts) / pareto_counts.sum() * 100
                         
                         fig_pareto = make_subplots(specs=[[{"secondary_y": True}]])
                         
                         fig_pareto.add_trace(
-                            go.Bar(x=pareto_data.index, y=pareto_data.values, name="Defects"),
+                            go.Bar(x=pareto_labels, y=pareto_counts, name="Defects"),
                             secondary_y=False
                         )
                         
                         fig_pareto.add_trace(
-                            go.Scatter(x=pareto_data.index, y=pareto_pct.values, name="Cumulative %", 
+                            go.Scatter(x=pareto_labels, y=pareto_pct, name="Cumulative %", 
                                       mode='lines+markers', line=dict(color='red')),
                             secondary_y=True
                         )
@@ -321,8 +664,12 @@ if uploaded_file is not None:
                         # Statistical testing (Chi-square)
                         st.markdown("#### Statistical Significance Testing")
                         
-                        contingency_table = pd.crosstab(df[category_col], df[defect_col] > 0)
-                        chi2, p_value, dof, expected = stats.chi2_contingency(contingency_table)
+                        # Rows with / without defects per category, from one grouped reduction
+                        # (columns no row falls into are dropped, as crosstab would)
+                        has_defect = (df[defect_col] > 0).groupby(df[category_col], sort=False, observed=True).agg(['sum', 'count']).to_numpy()
+                        contingency_table = np.column_stack([has_defect[:, 1] - has_defect[:, 0], has_defect[:, 0]])
+                        contingency_table = contingency_table[:, contingency_table.any(axis=0)]
+                        chi2, p_value, dof = chi2_independence(contingency_table)
                         
                         col1, col2, col3 = st.columns(3)
                         col1.metric("Chi-square statistic", f"{chi2:.2f}")
@@ -382,11 +729,12 @@ if uploaded_file is not None:
             try:
                 # Clean data
                 data = df[ctq_col].dropna()
+                arr = data.to_numpy(dtype=np.float64)
                 
-                # Basic statistics
-                mean = data.mean()
-                std = data.std()
-                median = data.median()
+                # Descriptive statistics and capability from one cached pass
+                cap = capability_metrics(arr, usl, lsl)
+                mean, std, median = cap['mean'], cap['std'], cap['median']
+                data_min, data_max = cap['min'], cap['max']
                 
                 st.markdown("### 📊 Descriptive Statistics")
                 
@@ -395,21 +743,20 @@ if uploaded_file is not None:
                 col1.metric("Mean", f"{mean:.4f}")
                 col2.metric("Std Dev", f"{std:.4f}")
                 col3.metric("Median", f"{median:.4f}")
-                col4.metric("Min", f"{data.min():.4f}")
-                col5.metric("Max", f"{data.max():.4f}")
+                col4.metric("Min", f"{data_min:.4f}")
+                col5.metric("Max", f"{data_max:.4f}")
                 
                 # Normality test
                 st.markdown("### 📈 Normality Assessment")
                 
                 # Anderson-Darling test
-                anderson_result = stats.anderson(data)
-                shapiro_stat, shapiro_p = shapiro(data) if len(data) < 5000 else (None, None)
+                ad_stat, ad_crit_5, norm_test, norm_p = normality_tests(arr)
                 
                 col1, col2 = st.columns(2)
                 
                 with col1:
-                    st.metric("Anderson-Darling Statistic", f"{anderson_result.statistic:.4f}")
-                    if anderson_result.statistic < anderson_result.critical_values[2]:  # 5% significance
+                    st.metric("Anderson-Darling Statistic", f"{ad_stat:.4f}")
+                    if ad_stat < ad_crit_5:
                         st.success("✅ Data appears normally distributed")
                         is_normal = True
                     else:
@@ -417,39 +764,47 @@ if uploaded_file is not None:
                         is_normal = False
                 
                 with col2:
-                    if shapiro_p:
-                        st.metric("Shapiro-Wilk p-value", f"{shapiro_p:.4f}")
-                        if shapiro_p > 0.05:
-                            st.success("✅ Passes Shapiro-Wilk test")
-                        else:
-                            st.warning("⚠️ Fails Shapiro-Wilk test")
+                    st.metric(f"{norm_test} p-value", f"{norm_p:.4f}")
+                    if norm_p > 0.05:
+                        st.success(f"✅ Passes {norm_test} test")
+                    else:
+                        st.warning(f"⚠️ Fails {norm_test} test")
+                
+                # Fitted normal density on one grid, shared by the histogram overlay
+                # and the capability chart (direct formula, one np.exp)
+                x_range = np.linspace(data_min - std, data_max + std, 200)
+                z = (x_range - mean) / std
+                pdf_range = np.exp(-0.5 * z * z) / (std * np.sqrt(2 * np.pi))
                 
                 # Histogram with normal curve
                 fig_hist = go.Figure()
                 
-                fig_hist.add_trace(go.Histogram(
-                    x=data,
+                # Bin on the server so the browser gets 30 bars rather than every point
+                density, edges = np.histogram(arr, bins=30, density=True)
+                fig_hist.add_trace(go.Bar(
+                    x=(edges[:-1] + edges[1:]) / 2,
+                    y=density,
+                    width=edges[1] - edges[0],
                     name='Actual Data',
-                    nbinsx=30,
-                    histnorm='probability density',
                     marker_color='lightblue'
                 ))
                 
-                # Normal curve overlay
-                x_range = np.linspace(data.min(), data.max(), 100)
-                normal_curve = stats.norm.pdf(x_range, mean, std)
+                # Normal curve overlay, over the observed range
+                in_data = (x_range >= data_min) & (x_range <= data_max)
                 
                 fig_hist.add_trace(go.Scatter(
-                    x=x_range,
-                    y=normal_curve,
+                    x=x_range[in_data],
+                    y=pdf_range[in_data],
                     name='Normal Distribution',
                     line=dict(color='red', width=2)
                 ))
                 
                 # Add spec limits
-                fig_hist.add_vline(x=usl, line_dash="dash", line_color="red", annotation_text="USL")
-                fig_hist.add_vline(x=lsl, line_dash="dash", line_color="red", annotation_text="LSL")
-                fig_hist.add_vline(x=target, line_dash="dash", line_color="green", annotation_text="Target")
+                add_reference_lines(fig_hist, 'x', [
+                    (usl, "USL", dict(color="red", dash="dash")),
+                    (lsl, "LSL", dict(color="red", dash="dash")),
+                    (target, "Target", dict(color="green", dash="dash")),
+                ])
                 
                 fig_hist.update_layout(
                     title="Histogram with Normal Curve and Spec Limits",
@@ -460,92 +815,38 @@ if uploaded_file is not None:
                 
                 st.plotly_chart(fig_hist, use_container_width=True)
                 
-                # Probability plot
-                fig_prob = go.Figure()
-                
-                # Q-Q plot
-                (osm, osr), (slope, intercept, r) = stats.probplot(data, dist="norm")
-                
-                fig_prob.add_trace(go.Scatter(
-                    x=osm,
-                    y=osr,
-                    mode='markers',
-                    name='Actual',
-                    marker=dict(color='blue')
-                ))
-                
-                fig_prob.add_trace(go.Scatter(
-                    x=osm,
-                    y=slope * osm + intercept,
-                    mode='lines',
-                    name='Theoretical Normal',
-                    line=dict(color='red')
-                ))
-                
-                fig_prob.update_layout(
-                    title=f"Normal Probability Plot (R² = {r**2:.4f})",
-                    xaxis_title="Theoretical Quantiles",
-                    yaxis_title="Sample Quantiles",
-                    height=500
-                )
-                
-                st.plotly_chart(fig_prob, use_container_width=True)
+                # Probability plot (figure cached on the data, so reruns skip the sort and fit)
+                if arr.size < 3 or not np.isfinite(arr).all() or np.ptp(arr) == 0:
+                    st.warning("⚠️ Insufficient data for a normal probability plot (need at least 3 finite, non-constant values)")
+                else:
+                    st.plotly_chart(normal_qq_figure(arr), use_container_width=True)
                 
                 # Process Capability Analysis
                 st.markdown("### 🎯 Process Capability Analysis")
                 
-                # Short-term capability (within subgroup)
-                cp = (usl - lsl) / (6 * std)
-                cpu = (usl - mean) / (3 * std)
-                cpl = (mean - lsl) / (3 * std)
-                cpk = min(cpu, cpl)
-                
-                # Long-term capability (overall)
-                pp = (usl - lsl) / (6 * std)
-                ppu = (usl - mean) / (3 * std)
-                ppl = (mean - lsl) / (3 * std)
-                ppk = min(ppu, ppl)
-                
-                # Calculate defects
-                defects_above = sum(data > usl)
-                defects_below = sum(data < lsl)
-                total_defects = defects_above + defects_below
-                
-                dpmo_actual = (total_defects / len(data)) * 1_000_000
-                
-                # Estimated DPMO from normal distribution
-                prob_above = 1 - stats.norm.cdf(usl, mean, std)
-                prob_below = stats.norm.cdf(lsl, mean, std)
-                dpmo_est = (prob_above + prob_below) * 1_000_000
-                
-                # Sigma levels
-                if dpmo_est >= 1000000:
-                    sigma_lt = 0
-                    sigma_st = 0
-                else:
-                    sigma_lt = stats.norm.ppf(1 - dpmo_est/1_000_000)
-                    sigma_st = sigma_lt + 1.5
+                cp, cpu, cpl, cpk = cap['cp'], cap['cpu'], cap['cpl'], cap['cpk']
+                pp, ppk = cap['pp'], cap['ppk']
+                total_defects, dpmo_actual, dpmo_est = cap['defects'], cap['dpmo_actual'], cap['dpmo_est']
+                sigma_lt, sigma_st = cap['sigma_lt'], cap['sigma_st']
                 
                 # Display capability metrics
-                col1, col2, col3, col4 = st.columns(4)
-                
-                with col1:
-                    st.metric("Cp", f"{cp:.3f}")
-                    st.metric("Cpu", f"{cpu:.3f}")
-                    
-                with col2:
-                    cpk_color = "🟢" if cpk >= 1.33 else "🟡" if cpk >= 1.0 else "🔴"
-                    st.metric("Cpk", f"{cpk_color} {cpk:.3f}")
-                    st.metric("Cpl", f"{cpl:.3f}")
-                
-                with col3:
-                    st.metric("Pp", f"{pp:.3f}")
-                    st.metric("Ppk", f"{ppk:.3f}")
-                
-                with col4:
-                    sigma_color = "🟢" if sigma_st >= 4 else "🟡" if sigma_st >= 3 else "🔴"
-                    st.metric("Sigma (ST)", f"{sigma_color} {sigma_st:.2f}")
-                    st.metric("Sigma (LT)", f"{sigma_lt:.2f}")
+                cpk_color = "🟢" if cpk >= 1.33 else "🟡" if cpk >= 1.0 else "🔴"
+                sigma_color = "🟢" if sigma_st >= 4 else "🟡" if sigma_st >= 3 else "🔴"
+                
+                # Four columns of two, in the original order
+                cap_metrics = [
+                    ("Cp", f"{cp:.3f}"),
+                    ("Cpu", f"{cpu:.3f}"),
+                    ("Cpk", f"{cpk_color} {cpk:.3f}"),
+                    ("Cpl", f"{cpl:.3f}"),
+                    ("Pp", f"{pp:.3f}"),
+                    ("Ppk", f"{ppk:.3f}"),
+                    ("Sigma (ST)", f"{sigma_color} {sigma_st:.2f}"),
+                    ("Sigma (LT)", f"{sigma_lt:.2f}")
+                ]
+                cols = st.columns(4)
+                for i, (label, value) in enumerate(cap_metrics):
+                    cols[i // 2].metric(label, value)
                 
                 # Capability interpretation
                 st.markdown("#### Capability Interpretation")
@@ -570,12 +871,9 @@ if uploaded_file is not None:
                 fig_capability = go.Figure()
                 
                 # Plot distribution
-                x_range = np.linspace(data.min() - std, data.max() + std, 200)
-                y_dist = stats.norm.pdf(x_range, mean, std)
-                
                 fig_capability.add_trace(go.Scatter(
                     x=x_range,
-                    y=y_dist,
+                    y=pdf_range,
                     fill='tozeroy',
                     name='Process Distribution',
                     fillcolor='rgba(0, 100, 255, 0.3)',
@@ -583,17 +881,19 @@ if uploaded_file is not None:
                 ))
                 
                 # Spec limits
-                fig_capability.add_vline(x=lsl, line_dash="dash", line_color="red", line_width=3, annotation_text="LSL")
-                fig_capability.add_vline(x=usl, line_dash="dash", line_color="red", line_width=3, annotation_text="USL")
-                fig_capability.add_vline(x=target, line_dash="dash", line_color="green", line_width=2, annotation_text="Target")
-                fig_capability.add_vline(x=mean, line_color="blue", line_width=2, annotation_text="Mean")
+                add_reference_lines(fig_capability, 'x', [
+                    (lsl, "LSL", dict(color="red", dash="dash", width=3)),
+                    (usl, "USL", dict(color="red", dash="dash", width=3)),
+                    (target, "Target", dict(color="green", dash="dash", width=2)),
+                    (mean, "Mean", dict(color="blue", width=2)),
+                ])
                 
                 # Shade out-of-spec areas
-                x_below = x_range[x_range < lsl]
-                y_below = stats.norm.pdf(x_below, mean, std)
+                below = x_range < lsl
+                x_below, y_below = x_range[below], pdf_range[below]
                 
-                x_above = x_range[x_range > usl]
-                y_above = stats.norm.pdf(x_above, mean, std)
+                above = x_range > usl
+                x_above, y_above = x_range[above], pdf_range[above]
                 
                 fig_capability.add_trace(go.Scatter(
                     x=x_below,
@@ -626,100 +926,21 @@ if uploaded_file is not None:
                 # Control Charts
                 st.markdown("### 📉 Control Charts")
                 
-                # I-MR Chart (Individual and Moving Range)
-                df_chart = df[[ctq_col]].copy()
-                df_chart['MR'] = df_chart[ctq_col].diff().abs()
-                
-                # Individual chart
-                ucl_i = mean + 2.66 * df_chart['MR'].mean()
-                lcl_i = mean - 2.66 * df_chart['MR'].mean()
-                
-                # Moving Range chart
-                mr_mean = df_chart['MR'].mean()
-                ucl_mr = 3.267 * mr_mean
-                lcl_mr = 0
-                
-                fig_control = make_subplots(
-                    rows=2, cols=1,
-                    subplot_titles=("Individual Chart", "Moving Range Chart"),
-                    vertical_spacing=0.15
-                )
-                
-                # Individual chart
-                fig_control.add_trace(
-                    go.Scatter(x=list(range(len(df_chart))), y=df_chart[ctq_col],
-                              mode='lines+markers', name='Individual Values',
-                              line=dict(color='blue')),
-                    row=1, col=1
-                )
-                
-                fig_control.add_trace(
-                    go.Scatter(x=list(range(len(df_chart))), y=[ucl_i]*len(df_chart),
-                              mode='lines', name='UCL', line=dict(color='red', dash='dash')),
-                    row=1, col=1
-                )
-                
-                fig_control.add_trace(
-                    go.Scatter(x=list(range(len(df_chart))), y=[mean]*len(df_chart),
-                              mode='lines', name='Mean', line=dict(color='green')),
-                    row=1, col=1
-                )
-                
-                fig_control.add_trace(
-                    go.Scatter(x=list(range(len(df_chart))), y=[lcl_i]*len(df_chart),
-                              mode='lines', name='LCL', line=dict(color='red', dash='dash')),
-                    row=1, col=1
-                )
-                
-                # Detect out of control points
-                out_of_control_i = (df_chart[ctq_col] > ucl_i) | (df_chart[ctq_col] < lcl_i)
-                
-                if out_of_control_i.any():
-                    fig_control.add_trace(
-                        go.Scatter(x=df_chart[out_of_control_i].index,
-                                  y=df_chart.loc[out_of_control_i, ctq_col],
-                                  mode='markers', name='Out of Control',
-                                  marker=dict(color='red', size=10, symbol='x')),
-                        row=1, col=1
-                    )
-                
-                # Moving Range chart
-                fig_control.add_trace(
-                    go.Scatter(x=list(range(len(df_chart))), y=df_chart['MR'],
-                              mode='lines+markers', name='Moving Range',
-                              line=dict(color='purple')),
-                    row=2, col=1
-                )
-                
-                fig_control.add_trace(
-                    go.Scatter(x=list(range(len(df_chart))), y=[ucl_mr]*len(df_chart),
-                              mode='lines', name='UCL (MR)', line=dict(color='red', dash='dash')),
-                    row=2, col=1
-                )
-                
-                fig_control.add_trace(
-                    go.Scatter(x=list(range(len(df_chart))), y=[mr_mean]*len(df_chart),
-                              mode='lines', name='Mean (MR)', line=dict(color='green')),
-                    row=2, col=1
-                )
-                
-                fig_control.update_layout(height=800, showlegend=False)
-                fig_control.update_xaxes(title_text="Sample Number", row=2, col=1)
-                fig_control.update_yaxes(title_text=ctq_col, row=1, col=1)
-                fig_control.update_yaxes(title_text="Moving Range", row=2, col=1)
+                # I-MR Chart (Individual and Moving Range), in upload order including gaps
+                fig_control, ooc_i = imr_chart(df[ctq_col].to_numpy(dtype=np.float64), mean, ctq_col)
                 
                 st.plotly_chart(fig_control, use_container_width=True)
                 
                 # Control chart interpretation
-                if out_of_control_i.any():
-                    st.warning(f"⚠️ **{out_of_control_i.sum()} out-of-control points detected** - Special cause variation present")
+                if ooc_i.size:
+                    st.warning(f"⚠️ **{ooc_i.size} out-of-control points detected** - Special cause variation present")
                 else:
                     st.success("✅ Process is in statistical control")
                 
                 # Root Cause Analysis for continuous data
                 st.markdown("### 🔍 Root Cause Analysis")
                 
-                categorical_cols = df.select_dtypes(include=['object']).columns.tolist()
+                categorical_cols = df.select_dtypes(include=['object', 'string', 'category']).columns.tolist()
                 numeric_factors = [col for col in numeric_cols if col != ctq_col]
                 
                 if categorical_cols or numeric_factors:
@@ -731,20 +952,41 @@ if uploaded_file is not None:
                     
                     if analysis_type == "Categorical Factors (ANOVA)" and categorical_cols:
                         
-                        factor_col = st.selectbox("Select categorical factor:", categorical_cols)
+                        ctq_values = df[ctq_col].to_numpy(dtype=np.float64)
+                        
+                        # Screen every categorical factor in one pass, most significant first
+                        factorized = {col: factor_codes(df[col]) for col in categorical_cols}
+                        screening = []
+                        for col, (codes, levels) in factorized.items():
+                            result = run_anova(ctq_values, codes, len(levels))
+                            if result is not None:
+                                screening.append((col, *result))
+                        
+                        if screening:
+                            ranking = pd.DataFrame(screening, columns=['Factor', 'F-statistic', 'p-value'])
+                            ranking = ranking.sort_values('p-value', kind='stable', ignore_index=True)
+                            st.markdown("#### Factor Screening (ANOVA)")
+                            st.dataframe(ranking.round({'F-statistic': 4, 'p-value': 6}), hide_index=True)
+                        
+                        ranked_cols = [row[0] for row in sorted(screening, key=lambda row: row[2])]
+                        factor_col = st.selectbox(
+                            "Select categorical factor:",
+                            ranked_cols + [col for col in categorical_cols if col not in ranked_cols]
+                        )
+                        
+                        codes, levels = factorized[factor_col]
+                        levels = tuple(str(level) for level in levels)
                         
                         # Box plot by category
-                        fig_box = px.box(df, x=factor_col, y=ctq_col,
-                                        title=f"{ctq_col} by {factor_col}",
-                                        color=factor_col)
+                        fig_box = factor_box_figure(ctq_values, codes, levels, factor_col, ctq_col)
                         
                         st.plotly_chart(fig_box, use_container_width=True)
                         
                         # ANOVA
-                        groups = [group[ctq_col].dropna() for name, group in df.groupby(factor_col)]
+                        anova = run_anova(ctq_values, codes, len(levels))
                         
-                        if len(groups) > 1 and all(len(g) > 1 for g in groups):
-                            f_stat, p_value = stats.f_oneway(*groups)
+                        if anova is not None:
+                            f_stat, p_value = anova
                             
                             st.markdown("#### ANOVA Results")
                             
@@ -756,44 +998,67 @@ if uploaded_file is not None:
                                 st.success(f"✅ **SIGNIFICANT ROOT CAUSE!** {factor_col} significantly affects {ctq_col} (p < 0.05)")
                                 
                                 # Show means by group
-                                means = df.groupby(factor_col)[ctq_col].agg(['mean', 'std', 'count'])
-                                st.dataframe(means.style.format({'mean': '{:.4f}', 'std': '{:.4f}'}))
+                                counts, group_means, group_stds = group_stats(ctq_values, codes, len(levels))
+                                means = pd.DataFrame({'mean': group_means, 'std': group_stds, 'count': counts},
+                                                     index=pd.Index(levels, name=factor_col))
+                                st.dataframe(means.round({'mean': 4, 'std': 4}))
                                 
                             else:
                                 st.info(f"ℹ️ {factor_col} does not significantly affect {ctq_col} (p = {p_value:.4f})")
                     
                     elif analysis_type == "Numeric Factors (Regression)" and numeric_factors:
                         
-                        factor_col = st.selectbox("Select numeric factor:", numeric_factors)
+                        # Complete (factor, CTQ) pairs in float64 feed the plot and the fits,
+                        # selected by position with one NaN mask per factor (no label alignment)
+                        ctq_all = df[ctq_col].to_numpy(dtype=np.float64, na_value=np.nan)
+                        ctq_present = ~np.isnan(ctq_all)
+                        pairs = {}
+                        for col in numeric_factors:
+                            factor_all = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+                            complete = ctq_present & ~np.isnan(factor_all)
+                            pairs[col] = (factor_all[complete], ctq_all[complete])
+                        
+                        # Screen every numeric factor in one pass, most significant first
+                        screening = []
+                        for col, (col_x, col_y) in pairs.items():
+                            if col_x.size > 2 and np.ptp(col_x) > 0:
+                                _, _, col_r, col_p = simple_ols(col_x, col_y)
+                                screening.append((col, col_r, col_r * col_r, col_p))
+                        
+                        if screening:
+                            ranking = pd.DataFrame(screening, columns=['Factor', 'Correlation (R)', 'R-squared', 'p-value'])
+                            ranking = ranking.sort_values('p-value', kind='stable', ignore_index=True)
+                            st.markdown("#### Factor Screening (Regression)")
+                            st.dataframe(ranking.round({'Correlation (R)': 4, 'R-squared': 4, 'p-value': 6}), hide_index=True)
+                        
+                        ranked_cols = [row[0] for row in sorted(screening, key=lambda row: row[3])]
+                        factor_col = st.selectbox(
+                            "Select numeric factor:",
+                            ranked_cols + [col for col in numeric_factors if col not in ranked_cols]
+                        )
+                        
+                        factor_x, factor_y = pairs[factor_col]
                         
                         # Scatter plot
-                        fig_scatter = px.scatter(df, x=factor_col, y=ctq_col,
-                                                trendline="ols",
-                                                title=f"{ctq_col} vs {factor_col}")
+                        fig_scatter = factor_scatter_figure(factor_x, factor_y, factor_col, ctq_col)
                         
                         st.plotly_chart(fig_scatter, use_container_width=True)
                         
                         # Correlation and regression
-                        correlation = df[[factor_col, ctq_col]].corr().iloc[0, 1]
-                        
-                        X = df[[factor_col]].dropna()
-                        y = df.loc[X.index, ctq_col]
-                        X = sm.add_constant(X)
-                        
-                        model = sm.OLS(y, X).fit()
+                        intercept, slope, correlation, slope_p = simple_ols(factor_x, factor_y)
                         
                         st.markdown("#### Regression Analysis")
                         
                         col1, col2, col3 = st.columns(3)
                         col1.metric("Correlation (R)", f"{correlation:.4f}")
-                        col2.metric("R-squared", f"{model.rsquared:.4f}")
-                        col3.metric("p-value", f"{model.pvalues[1]:.6f}")
+                        col2.metric("R-squared", f"{correlation * correlation:.4f}")
+                        col3.metric("p-value", f"{slope_p:.6f}")
                         
-                        if model.pvalues[1] < 0.05:
+                        if slope_p < 0.05:
                             st.success(f"✅ **SIGNIFICANT RELATIONSHIP!** {factor_col} significantly predicts {ctq_col}")
-                            st.write(f"**Equation:** {ctq_col} = {model.params[0]:.4f} + {model.params[1]:.4f} × {factor_col}")
+                            st.write(f"**Equation:** {ctq_col} = {intercept:.4f} + {slope:.4f} × {factor_col}")
                         else:
-                            st.info(f"ℹ️ No significant relationship found (p = {model.pvalues[1]:.4f})")
+                            st.info(f"ℹ️ No significant relationship found (p = {slope_p:.4f})")
                 
             except Exception as e:
                 st.error(f"Error in analysis: {e}")
@@ -0,0 +1,37 @@
+"""
+Helpers shared by the Six Sigma Streamlit apps
+"""
+
+import streamlit as st
+import pandas as pd
+from io import BytesIO
+
+# Uploads are re-read on every rerun; parse each distinct file only once
+@st.cache_data(show_spinner=False)
+def load_uploaded_data(file_bytes, file_name):
+    """Parse uploaded CSV/Excel bytes into a DataFrame (cached on file content)"""
+    buffer = BytesIO(file_bytes)
+    if file_name.endswith('.csv'):
+        # pyarrow's multithreaded parser first; it is stricter, so fall back to the C parser
+        try:
+            return pd.read_csv(buffer, engine='pyarrow')
+        except ValueError:
+            buffer.seek(0)
+            return pd.read_csv(buffer)
+    return pd.read_excel(buffer)
+
+# add_hline/add_vline re-validate the whole layout on every call; batch the
+# limit lines into one shapes/annotations update per chart instead.
+def add_reference_lines(fig, axis, lines, xref='x', yref='y'):
+    """Add labelled vertical ('x') or horizontal ('y') reference lines in one layout update"""
+    shapes, labels = [], []
+    for value, label, line in lines:
+        if axis == 'x':
+            shapes.append(dict(type='line', xref=xref, x0=value, x1=value, yref=f'{yref} domain', y0=0, y1=1, line=line))
+            labels.append(dict(text=label, showarrow=False, xref=xref, x=value, xanchor='left', yref=f'{yref} domain', y=1, yanchor='top'))
+        else:
+            shapes.append(dict(type='line', xref=f'{xref} domain', x0=0, x1=1, yref=yref, y0=value, y1=value, line=line))
+            labels.append(dict(text=label, showarrow=False, xref=f'{xref} domain', x=1, xanchor='right', yref=yref, y=value, yanchor='bottom'))
+    # Append, so shapes and annotations already on the figure (e.g. subplot titles) survive
+    fig.update_layout(shapes=fig.layout.shapes + tuple(shapes),
+                      annotations=fig.layout.annotations + tuple(labels))
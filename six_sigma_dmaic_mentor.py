@@ -7,14 +7,11 @@ Acts as your virtual Six Sigma mentor throughout the entire project lifecycle
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-from scipy import stats
-from scipy.stats import normaltest, shapiro
-import statsmodels.api as sm
 from datetime import datetime
 import json
+import copy
+import bisect
+from six_sigma_common import add_reference_lines, load_uploaded_data
 
 # Page configuration
 st.set_page_config(
@@ -64,23 +61,112 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
+# Control charts past this many points are thinned for display only
+_MAX_CHART_POINTS = 3000
+
+def _lttb_indices(y, n_out):
+    """Largest-Triangle-Three-Buckets: indices of n_out points that keep the series' shape"""
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+    
+    # First and last points are kept; the interior is split into n_out - 2 buckets,
+    # followed by a one-point bucket holding the last sample
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    sizes = np.diff(np.append(edges, n))
+    mean_x = edges + (sizes - 1) / 2
+    mean_y = np.add.reduceat(y, edges) / sizes
+    
+    # Each bucket's triangle is anchored on the previous bucket's centroid rather than
+    # the previously chosen point, so every bucket is scored at once instead of in a loop
+    prev_x = np.r_[0.0, mean_x[:-2]]
+    prev_y = np.r_[y[0], mean_y[:-2]]
+    bucket = np.repeat(np.arange(n_out - 2), sizes[:-1])
+    xs = np.arange(1, n - 1)
+    px, py = prev_x[bucket], prev_y[bucket]
+    area = np.abs((px - mean_x[1:][bucket]) * (y[1:n - 1] - py) - (px - xs) * (mean_y[1:][bucket] - py))
+    
+    # First point reaching each bucket's maximum area
+    best = np.maximum.reduceat(area, edges[:-1] - 1)
+    hits = np.flatnonzero(area == best[bucket])
+    _, first = np.unique(bucket[hits], return_index=True)
+    
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0], idx[-1] = 0, n - 1
+    idx[1:-1] = xs[hits[first]]
+    return idx
+
+# Bounded in memory: Streamlit's disk persistence ignores ttl and never evicts
+# its files, so every uploaded dataset would stay on disk for good.
+@st.cache_data(show_spinner=False, max_entries=32, ttl=86400)
+def compute_baseline(values, lsl, usl):
+    """Capability, DPMO and Sigma level for a baseline sample (one pass per statistic)"""
+    from scipy import stats
+    
+    mean = values.mean()
+    std = values.std(ddof=1)
+    std_pop = values.std(ddof=0)
+    
+    defects = int(np.count_nonzero((values < lsl) | (values > usl)))
+    defect_rate = defects / len(values)
+    dpmo = defect_rate * 1_000_000
+    
+    if dpmo >= 1000000:
+        sigma_level = 0
+    else:
+        sigma_level = stats.norm.ppf(1 - defect_rate) + 1.5
+    
+    return {
+        'mean': mean,
+        'std': std,
+        'cp': (usl - lsl) / (6 * std),
+        'cpk': min((usl - mean) / (3 * std), (mean - lsl) / (3 * std)),
+        'pp': (usl - lsl) / (6 * std_pop),
+        'ppk': min((usl - mean) / (3 * std_pop), (mean - lsl) / (3 * std_pop)),
+        'defects': defects,
+        'dpmo': dpmo,
+        'sigma_level': sigma_level
+    }
+
+# Baseline verdicts, ordered by ascending Sigma threshold (row 0 is below 3σ)
+_BASELINE_THRESHOLDS = (3, 4, 5)
+_BASELINE_VERDICTS = (
+    ("🔴 **POOR** - Immediate improvement needed",
+     "Critical situation - prioritize root cause analysis and quick wins."),
+    ("🟠 **AVERAGE** - Typical industry performance",
+     "Significant improvement opportunity - proceed with Analyze phase to find root causes."),
+    ("🟡 **GOOD** - Above average, but improvement possible",
+     "Target specific improvement areas to reach Six Sigma level."),
+    ("🟢 **EXCELLENT** - World-class performance!",
+     "Focus on maintaining and controlling this level."),
+)
+
+# Phase names shared by the navigator, status list and project template
+_DMAIC_PHASES = ('Define', 'Measure', 'Analyze', 'Improve', 'Control')
+_NAV_PAGES = ('Welcome',) + _DMAIC_PHASES + ('Project Summary',)
+
 # Initialize session state for project tracking
+_PROJECT_TEMPLATE = {
+    'phase': 'Welcome',
+    'define_complete': False,
+    'measure_complete': False,
+    'analyze_complete': False,
+    'improve_complete': False,
+    'control_complete': False,
+    'project_name': '',
+    'problem_statement': '',
+    'goal': '',
+    'baseline_sigma': None,
+    'improved_sigma': None,
+    'findings': [],
+    'solutions': [],
+}
+
 if 'project_data' not in st.session_state:
-    st.session_state.project_data = {
-        'phase': 'Welcome',
-        'define_complete': False,
-        'measure_complete': False,
-        'analyze_complete': False,
-        'improve_complete': False,
-        'control_complete': False,
-        'project_name': '',
-        'problem_statement': '',
-        'goal': '',
-        'baseline_sigma': None,
-        'improved_sigma': None,
-        'findings': [],
-        'solutions': [],
-    }
+    st.session_state.project_data = copy.deepcopy(_PROJECT_TEMPLATE)
+
+# Bound once per run; each st.session_state lookup goes through its proxy
+project = st.session_state.project_data
 
 # Sidebar - Project Navigation
 with st.sidebar:
@@ -89,28 +175,20 @@ with st.sidebar:
     # Project Status
     st.markdown("### 📊 Project Status")
     
-    phases = {
-        'Define': st.session_state.project_data['define_complete'],
-        'Measure': st.session_state.project_data['measure_complete'],
-        'Analyze': st.session_state.project_data['analyze_complete'],
-        'Improve': st.session_state.project_data['improve_complete'],
-        'Control': st.session_state.project_data['control_complete'],
-    }
+    phases = {phase: project[f'{phase.lower()}_complete'] for phase in _DMAIC_PHASES}
     
-    for phase, complete in phases.items():
-        status = "✅" if complete else "⏳"
-        st.markdown(f"{status} **{phase}**")
+    st.markdown("\n\n".join(f"{'✅' if complete else '⏳'} **{phase}**" for phase, complete in phases.items()))
     
     st.markdown("---")
     
     # Phase Selection
     current_phase = st.selectbox(
         "Select DMAIC Phase:",
-        ['Welcome', 'Define', 'Measure', 'Analyze', 'Improve', 'Control', 'Project Summary'],
-        index=['Welcome', 'Define', 'Measure', 'Analyze', 'Improve', 'Control', 'Project Summary'].index(st.session_state.project_data['phase'])
+        _NAV_PAGES,
+        index=_NAV_PAGES.index(project['phase'])
     )
     
-    st.session_state.project_data['phase'] = current_phase
+    project['phase'] = current_phase
     
     st.markdown("---")
     
@@ -118,7 +196,7 @@ with st.sidebar:
     st.markdown("### ⚡ Quick Actions")
     
     if st.button("📥 Save Project"):
-        project_json = json.dumps(st.session_state.project_data, indent=2)
+        project_json = json.dumps(project, indent=2)
         st.download_button(
             "Download Project Data",
             project_json,
@@ -128,21 +206,7 @@ with st.sidebar:
     
     if st.button("🔄 Reset Project"):
         if st.checkbox("Confirm reset"):
-            st.session_state.project_data = {
-                'phase': 'Welcome',
-                'define_complete': False,
-                'measure_complete': False,
-                'analyze_complete': False,
-                'improve_complete': False,
-                'control_complete': False,
-                'project_name': '',
-                'problem_statement': '',
-                'goal': '',
-                'baseline_sigma': None,
-                'improved_sigma': None,
-                'findings': [],
-                'solutions': [],
-            }
+            st.session_state.project_data = project = copy.deepcopy(_PROJECT_TEMPLATE)
             st.success("Project reset!")
             st.experimental_rerun()
 
@@ -254,7 +318,7 @@ if current_phase == 'Welcome':
         """)
     
     if st.button("🚀 Start Your Six Sigma Project", type="primary"):
-        st.session_state.project_data['phase'] = 'Define'
+        project['phase'] = 'Define'
         st.experimental_rerun()
 
 # ==========================================
@@ -327,11 +391,11 @@ elif current_phase == 'Define':
     with col1:
         project_name = st.text_input(
             "Project Name:",
-            value=st.session_state.project_data.get('project_name', ''),
+            value=project.get('project_name', ''),
             placeholder="e.g., Reduce Defects in Assembly Line 3",
             help="Give your project a clear, descriptive name"
         )
-        st.session_state.project_data['project_name'] = project_name
+        project['project_name'] = project_name
         
         business_case = st.text_area(
             "Business Case (Why is this important?):",
@@ -342,12 +406,12 @@ elif current_phase == 'Define':
         
         problem_statement = st.text_area(
             "Problem Statement (What is wrong?):",
-            value=st.session_state.project_data.get('problem_statement', ''),
+            value=project.get('problem_statement', ''),
             placeholder="Assembly Line 3 defect rate is currently 8% (baseline period: Jan-Mar 2024, n=5000 units), which is above the industry standard of 2% and customer requirement of 3%.",
             help="Be specific! Include: WHAT is happening, WHERE, WHEN, HOW MUCH (quantify with data)",
             height=100
         )
-        st.session_state.project_data['problem_statement'] = problem_statement
+        project['problem_statement'] = problem_statement
         
         # Problem Statement Validator
         if problem_statement:
@@ -371,12 +435,12 @@ elif current_phase == 'Define':
     with col2:
         goal_statement = st.text_area(
             "Goal Statement (What do you want to achieve?):",
-            value=st.session_state.project_data.get('goal', ''),
+            value=project.get('goal', ''),
             placeholder="Reduce Assembly Line 3 defect rate from 8% to less than 3% by December 2024, resulting in annual savings of $350K.",
             help="Use SMART criteria: Specific, Measurable, Achievable, Relevant, Time-bound",
             height=100
         )
-        st.session_state.project_data['goal'] = goal_statement
+        project['goal'] = goal_statement
         
         # SMART Goal Validator
         if goal_statement:
@@ -531,8 +595,8 @@ elif current_phase == 'Define':
         elif not goal_statement:
             st.error("❌ Please enter a goal statement")
         else:
-            st.session_state.project_data['define_complete'] = True
-            st.session_state.project_data['phase'] = 'Measure'
+            project['define_complete'] = True
+            project['phase'] = 'Measure'
             st.success("🎉 DEFINE Phase Complete! Moving to MEASURE phase...")
             st.balloons()
             st.experimental_rerun()
@@ -592,6 +656,10 @@ Target End: {target_end_date}
 
 elif current_phase == 'Measure':
     
+    # Only the Measure page charts and runs statistics; other pages skip these imports
+    import plotly.graph_objects as go
+    from scipy import stats
+    
     st.markdown("""
     <div class="phase-box">
     <h2>📊 MEASURE Phase - Establishing Your Baseline</h2>
@@ -707,10 +775,7 @@ elif current_phase == 'Measure':
     
     if uploaded_file:
         try:
-            if uploaded_file.name.endswith('.csv'):
-                df = pd.read_csv(uploaded_file)
-            else:
-                df = pd.read_excel(uploaded_file)
+            df = load_uploaded_data(uploaded_file.getvalue(), uploaded_file.name)
             
             st.success(f"✅ Data loaded: {len(df)} rows, {len(df.columns)} columns")
             
@@ -760,28 +825,14 @@ elif current_phase == 'Measure':
                 if st.button("🚀 Calculate Baseline Performance", type="primary"):
                     data = df[ctq_column].dropna()
                     
-                    mean = data.mean()
-                    std = data.std()
-                    
-                    # Capability
-                    cp = (usl - lsl) / (6 * std)
-                    cpu = (usl - mean) / (3 * std)
-                    cpl = (mean - lsl) / (3 * std)
-                    cpk = min(cpu, cpl)
-                    
-                    pp = (usl - lsl) / (6 * data.std(ddof=0))
-                    ppk = min((usl - mean)/(3*data.std(ddof=0)), (mean - lsl)/(3*data.std(ddof=0)))
+                    baseline = compute_baseline(data.to_numpy(dtype=np.float64), lsl, usl)
+                    mean = baseline['mean']
+                    cpk = baseline['cpk']
+                    defects = baseline['defects']
+                    dpmo = baseline['dpmo']
+                    sigma_level = baseline['sigma_level']
                     
-                    # Defects
-                    defects = ((data < lsl) | (data > usl)).sum()
-                    dpmo = (defects / len(data)) * 1_000_000
-                    
-                    if dpmo >= 1000000:
-                        sigma_level = 0
-                    else:
-                        sigma_level = stats.norm.ppf(1 - dpmo/1_000_000) + 1.5
-                    
-                    st.session_state.project_data['baseline_sigma'] = sigma_level
+                    project['baseline_sigma'] = sigma_level
                     
                     st.markdown("---")
                     st.markdown("## 📊 BASELINE PERFORMANCE RESULTS")
@@ -800,18 +851,7 @@ elif current_phase == 'Measure':
                     # Interpretation
                     st.markdown("### 🎯 Performance Interpretation")
                     
-                    if sigma_level >= 5:
-                        interpretation = "🟢 **EXCELLENT** - World-class performance!"
-                        recommendation = "Focus on maintaining and controlling this level."
-                    elif sigma_level >= 4:
-                        interpretation = "🟡 **GOOD** - Above average, but improvement possible"
-                        recommendation = "Target specific improvement areas to reach Six Sigma level."
-                    elif sigma_level >= 3:
-                        interpretation = "🟠 **AVERAGE** - Typical industry performance"
-                        recommendation = "Significant improvement opportunity - proceed with Analyze phase to find root causes."
-                    else:
-                        interpretation = "🔴 **POOR** - Immediate improvement needed"
-                        recommendation = "Critical situation - prioritize root cause analysis and quick wins."
+                    interpretation, recommendation = _BASELINE_VERDICTS[bisect.bisect_right(_BASELINE_THRESHOLDS, sigma_level)]
                     
                     st.markdown(f"""
                     <div class="success-box">
@@ -830,10 +870,12 @@ elif current_phase == 'Measure':
                         opacity=0.7
                     ))
                     
-                    fig.add_vline(x=lsl, line_dash="dash", line_color="red", annotation_text="LSL")
-                    fig.add_vline(x=usl, line_dash="dash", line_color="red", annotation_text="USL")
-                    fig.add_vline(x=target, line_dash="dash", line_color="green", annotation_text="Target")
-                    fig.add_vline(x=mean, line_color="blue", annotation_text="Mean")
+                    add_reference_lines(fig, 'x', [
+                        (lsl, "LSL", dict(color="red", dash="dash")),
+                        (usl, "USL", dict(color="red", dash="dash")),
+                        (target, "Target", dict(color="green", dash="dash")),
+                        (mean, "Mean", dict(color="blue")),
+                    ])
                     
                     fig.update_layout(
                         title="Baseline Process Distribution",
@@ -842,35 +884,42 @@ elif current_phase == 'Measure':
                         height=500
                     )
                     
-                    st.plotly_chart(fig, use_container_width=True)
+                    st.plotly_chart(fig, use_container_width=True, key="cap_hist")
                     
                     # Control Chart
                     st.markdown("### 📈 Control Chart (Process Stability Check)")
                     
-                    mr = data.diff().abs()
-                    mr_mean = mr.mean()
+                    values = data.to_numpy(dtype=np.float64)
+                    
+                    mr_mean = np.abs(np.diff(values)).mean()
                     
                     ucl = mean + 2.66 * mr_mean
                     lcl = mean - 2.66 * mr_mean
                     
                     fig2 = go.Figure()
                     
-                    fig2.add_trace(go.Scatter(
-                        y=data,
+                    # Limits and out-of-control points use every sample; only the drawn line is thinned
+                    shown = _lttb_indices(values, _MAX_CHART_POINTS)
+                    
+                    fig2.add_trace(go.Scattergl(
+                        x=shown,
+                        y=values[shown],
                         mode='lines+markers',
                         name='Individual Values',
                         line=dict(color='blue')
                     ))
                     
-                    fig2.add_hline(y=ucl, line_dash="dash", line_color="red", annotation_text="UCL")
-                    fig2.add_hline(y=mean, line_color="green", annotation_text="Mean")
-                    fig2.add_hline(y=lcl, line_dash="dash", line_color="red", annotation_text="LCL")
+                    add_reference_lines(fig2, 'y', [
+                        (ucl, "UCL", dict(color="red", dash="dash")),
+                        (mean, "Mean", dict(color="green")),
+                        (lcl, "LCL", dict(color="red", dash="dash")),
+                    ])
                     
-                    out_of_control = (data > ucl) | (data < lcl)
-                    if out_of_control.any():
-                        fig2.add_trace(go.Scatter(
-                            x=data[out_of_control].index,
-                            y=data[out_of_control],
+                    ooc_idx = np.flatnonzero((values > ucl) | (values < lcl))
+                    if ooc_idx.size:
+                        fig2.add_trace(go.Scattergl(
+                            x=ooc_idx,
+                            y=values[ooc_idx],
                             mode='markers',
                             name='Out of Control',
                             marker=dict(color='red', size=12, symbol='x')
@@ -883,10 +932,10 @@ elif current_phase == 'Measure':
                         height=500
                     )
                     
-                    st.plotly_chart(fig2, use_container_width=True)
+                    st.plotly_chart(fig2, use_container_width=True, key="imr_chart")
                     
-                    if out_of_control.any():
-                        st.warning(f"⚠️ {out_of_control.sum()} out-of-control points detected! Process may not be stable.")
+                    if ooc_idx.size:
+                        st.warning(f"⚠️ {ooc_idx.size} out-of-control points detected! Process may not be stable.")
                         st.markdown("""
                         <div class="warning-box">
                         <b>⚠️ Unstable Process Detected:</b><br>
@@ -900,7 +949,7 @@ elif current_phase == 'Measure':
                     else:
                         st.success("✅ Process is in statistical control - stable and predictable")
                     
-                    st.session_state.project_data['measure_complete'] = True
+                    project['measure_complete'] = True
             
             else:  # Discrete data
                 defect_col = st.selectbox("Select defect count column:", numeric_cols)
@@ -918,7 +967,7 @@ elif current_phase == 'Measure':
                     else:
                         sigma_level = stats.norm.ppf(1 - dpo) + 1.5
                     
-                    st.session_state.project_data['baseline_sigma'] = sigma_level
+                    project['baseline_sigma'] = sigma_level
                     
                     st.markdown("## 📊 BASELINE PERFORMANCE RESULTS")
                     
@@ -944,15 +993,17 @@ elif current_phase == 'Measure':
                     
                     fig = go.Figure()
                     
-                    fig.add_trace(go.Scatter(
+                    fig.add_trace(go.Scattergl(
                         y=df['proportion'],
                         mode='lines+markers',
                         name='Proportion Defective'
                     ))
                     
-                    fig.add_hline(y=ucl_p, line_dash="dash", line_color="red", annotation_text="UCL")
-                    fig.add_hline(y=p_bar, line_color="green", annotation_text="P-bar")
-                    fig.add_hline(y=lcl_p, line_dash="dash", line_color="red", annotation_text="LCL")
+                    add_reference_lines(fig, 'y', [
+                        (ucl_p, "UCL", dict(color="red", dash="dash")),
+                        (p_bar, "P-bar", dict(color="green")),
+                        (lcl_p, "LCL", dict(color="red", dash="dash")),
+                    ])
                     
                     fig.update_layout(
                         title="P-Chart: Baseline Process Control",
@@ -961,9 +1012,9 @@ elif current_phase == 'Measure':
                         height=500
                     )
                     
-                    st.plotly_chart(fig, use_container_width=True)
+                    st.plotly_chart(fig, use_container_width=True, key="p_chart")
                     
-                    st.session_state.project_data['measure_complete'] = True
+                    project['measure_complete'] = True
         
         except Exception as e:
             st.error(f"Error loading data: {e}")
@@ -973,9 +1024,9 @@ elif current_phase == 'Measure':
     
     st.markdown("---")
     
-    if st.session_state.project_data.get('measure_complete'):
+    if project.get('measure_complete'):
         if st.button("✅ Complete MEASURE Phase", type="primary"):
-            st.session_state.project_data['phase'] = 'Analyze'
+            project['phase'] = 'Analyze'
             st.success("🎉 MEASURE Phase Complete! Moving to ANALYZE...")
             st.balloons()
             st.experimental_rerun()
@@ -1048,34 +1099,27 @@ elif current_phase == 'Project Summary':
     st.markdown("## 📊 Six Sigma Project Summary")
     
     st.markdown(f"""
-    ### Project: {st.session_state.project_data.get('project_name', 'Not Set')}
+    ### Project: {project.get('project_name', 'Not Set')}
     
     **Problem Statement:**  
-    {st.session_state.project_data.get('problem_statement', 'Not defined')}
+    {project.get('problem_statement', 'Not defined')}
     
     **Goal:**  
-    {st.session_state.project_data.get('goal', 'Not defined')}
+    {project.get('goal', 'Not defined')}
     
     **Baseline Sigma Level:**  
-    {st.session_state.project_data.get('baseline_sigma', 'Not calculated')}
+    {project.get('baseline_sigma', 'Not calculated')}
     
     **Improved Sigma Level:**  
-    {st.session_state.project_data.get('improved_sigma', 'Not yet measured')}
+    {project.get('improved_sigma', 'Not yet measured')}
     
     **Project Progress:**
     """)
     
-    phases = {
-        'Define': st.session_state.project_data['define_complete'],
-        'Measure': st.session_state.project_data['measure_complete'],
-        'Analyze': st.session_state.project_data['analyze_complete'],
-        'Improve': st.session_state.project_data['improve_complete'],
-        'Control': st.session_state.project_data['control_complete'],
-    }
-    
-    for phase, complete in phases.items():
-        status = "✅ Complete" if complete else "⏳ In Progress"
-        st.markdown(f"- **{phase}:** {status}")
+    st.markdown("\n".join(
+        f"- **{phase}:** {'✅ Complete' if project[f'{phase.lower()}_complete'] else '⏳ In Progress'}"
+        for phase in _DMAIC_PHASES
+    ))
 
 # Footer
 st.markdown("---")
@@ -22,6 +22,7 @@ from statsmodels.formula.api import ols
 from statsmodels.stats.anova import anova_lm
 from datetime import datetime, timedelta
 import json
+import copy
 from io import BytesIO
 import base64
 
@@ -143,76 +144,91 @@ st.markdown("""
 # SESSION STATE INITIALIZATION
 # ═══════════════════════════════════════════════════════════════════
 
+# Phase names shared by the sidebar progress, roadmap, timeline and tabs
+_DMAIC_PHASES = ('Define', 'Measure', 'Analyze', 'Improve', 'Control')
+
+_PROJECT_TEMPLATE = {
+    # Navigation
+    'current_phase': 'Home',
+    'current_tool': None,
+    
+    # Project Info
+    'project_name': '',
+    'project_type': '',
+    'start_date': None,   # stamped on first load
+    'target_date': None,
+    
+    # Define Phase
+    'define_complete': False,
+    'problem_statement': '',
+    'goal_statement': '',
+    'business_case': '',
+    'scope_in': '',
+    'scope_out': '',
+    'team_members': [],
+    'champion': '',
+    'sipoc': {},
+    'voc_data': [],
+    'ctq_characteristics': [],
+    
+    # Measure Phase
+    'measure_complete': False,
+    'baseline_data': None,
+    'measurement_system': {},
+    'gage_rr_results': {},
+    'baseline_sigma': None,
+    'baseline_cpk': None,
+    'baseline_dpmo': None,
+    'process_stable': None,
+    
+    # Analyze Phase
+    'analyze_complete': False,
+    'root_causes': [],
+    'hypothesis_tests': [],
+    'regression_models': [],
+    'fishbone_data': {},
+    'five_whys': [],
+    'pareto_data': {},
+    
+    # Improve Phase
+    'improve_complete': False,
+    'solutions': [],
+    'doe_results': {},
+    'pilot_results': {},
+    'cost_benefit': {},
+    'implementation_plan': [],
+    
+    # Control Phase
+    'control_complete': False,
+    'control_plan': {},
+    'sop_created': False,
+    'training_complete': False,
+    'handoff_complete': False,
+    'final_sigma': None,
+    
+    # Data Storage
+    'uploaded_data': {},
+    'analysis_results': {},
+    'charts_generated': [],
+}
+
 if 'project_data' not in st.session_state:
-    st.session_state.project_data = {
-        # Navigation
-        'current_phase': 'Home',
-        'current_tool': None,
-        
-        # Project Info
-        'project_name': '',
-        'project_type': '',
-        'start_date': datetime.now(),
-        'target_date': datetime.now() + timedelta(days=180),
-        
-        # Define Phase
-        'define_complete': False,
-        'problem_statement': '',
-        'goal_statement': '',
-        'business_case': '',
-        'scope_in': '',
-        'scope_out': '',
-        'team_members': [],
-        'champion': '',
-        'sipoc': {},
-        'voc_data': [],
-        'ctq_characteristics': [],
-        
-        # Measure Phase
-        'measure_complete': False,
-        'baseline_data': None,
-        'measurement_system': {},
-        'gage_rr_results': {},
-        'baseline_sigma': None,
-        'baseline_cpk': None,
-        'baseline_dpmo': None,
-        'process_stable': None,
-        
-        # Analyze Phase
-        'analyze_complete': False,
-        'root_causes': [],
-        'hypothesis_tests': [],
-        'regression_models': [],
-        'fishbone_data': {},
-        'five_whys': [],
-        'pareto_data': {},
-        
-        # Improve Phase
-        'improve_complete': False,
-        'solutions': [],
-        'doe_results': {},
-        'pilot_results': {},
-        'cost_benefit': {},
-        'implementation_plan': [],
-        
-        # Control Phase
-        'control_complete': False,
-        'control_plan': {},
-        'sop_created': False,
-        'training_complete': False,
-        'handoff_complete': False,
-        'final_sigma': None,
-        
-        # Data Storage
-        'uploaded_data': {},
-        'analysis_results': {},
-        'charts_generated': [],
-    }
+    st.session_state.project_data = copy.deepcopy(_PROJECT_TEMPLATE)
+    st.session_state.project_data['start_date'] = datetime.now()
+    st.session_state.project_data['target_date'] = st.session_state.project_data['start_date'] + timedelta(days=180)
+
+# Bound once per run; each st.session_state lookup goes through its proxy
+project = st.session_state.project_data
 
 # ═══════════════════════════════════════════════════════════════════
 # HELPER FUNCTIONS
 # ═══════════════════════════════════════════════════════════════════
 
+# Bound once so the hot paths skip the scipy.stats attribute dispatch
+_NORM = stats.norm
+_NORM_CDF = _NORM.cdf
+_NORM_PPF = _NORM.ppf
+
 def calculate_sigma_level(dpmo):
     """Calculate Sigma level from DPMO"""
     if dpmo >= 1000000:
@@ -220,11 +236,11 @@ def calculate_sigma_level(dpmo):
     elif dpmo <= 0:
         return 6
     else:
-        return stats.norm.ppf(1 - dpmo/1000000) + 1.5
+        return _NORM_PPF(1 - dpmo/1000000) + 1.5
 
 def calculate_dpmo_from_sigma(sigma):
-    """Calculate DPMO from Sigma level"""
-    return (1 - stats.norm.cdf(sigma - 1.5)) * 1000000
+    """Calculate DPMO from Sigma level (scalar or NumPy array)"""
+    return (1 - _NORM_CDF(sigma - 1.5)) * 1000000
 
 def calculate_process_capability(data, lsl, usl, target=None):
     """Calculate comprehensive process capability metrics"""
@@ -293,19 +309,23 @@ def create_control_chart(data, chart_type='I-MR'):
             'moving_range': mr
         }
 
+@st.cache_data(show_spinner=False)
 def check_normality(data):
     """Comprehensive normality testing"""
+    # Convert once; each test would otherwise re-validate and copy the Series
+    values = np.ascontiguousarray(data, dtype=np.float64)
+    
     # Anderson-Darling
-    anderson_result = anderson(data)
+    anderson_result = anderson(values)
     
     # Shapiro-Wilk (if sample size < 5000)
-    if len(data) < 5000:
-        shapiro_stat, shapiro_p = shapiro(data)
+    if len(values) < 5000:
+        shapiro_stat, shapiro_p = shapiro(values)
     else:
         shapiro_stat, shapiro_p = None, None
     
     # Kolmogorov-Smirnov
-    ks_stat, ks_p = stats.kstest(data, 'norm', args=(data.mean(), data.std()))
+    ks_stat, ks_p = stats.kstest(values, 'norm', args=(values.mean(), values.std(ddof=1)))
     
     return {
         'anderson_stat': anderson_result.statistic,
@@ -322,8 +342,8 @@ def check_normality(data):
 def generate_sigma_conversion_table():
     """Generate Sigma to DPMO conversion table"""
     sigma_levels = np.arange(1, 6.1, 0.1)
-    dpmo_values = [calculate_dpmo_from_sigma(s) for s in sigma_levels]
-    yield_values = [(1 - d/1000000) * 100 for d in dpmo_values]
+    dpmo_values = calculate_dpmo_from_sigma(sigma_levels)
+    yield_values = (1 - dpmo_values/1000000) * 100
     
     df = pd.DataFrame({
         'Sigma Level': sigma_levels,
@@ -333,6 +353,39 @@ def generate_sigma_conversion_table():
     
     return df
 
+@st.cache_data(show_spinner=False)
+def generate_sigma_reference_table():
+    """Static Sigma level reference table (read-only, built once per process)"""
+    return pd.DataFrame({
+        'Sigma Level': [6, 5, 4, 3, 2, 1],
+        'DPMO': [3.4, 233, 6210, 66807, 308538, 690000],
+        'Yield %': [99.99966, 99.9767, 99.379, 93.32, 69.15, 31.00],
+        'Quality Level': ['World Class', 'Excellent', 'Good', 'Average', 'Poor', 'Non-competitive'],
+        'Example': [
+            'Aviation safety',
+            'Top manufacturing',
+            'Most manufacturing',
+            'Typical business',
+            'Service industries',
+            'Unacceptable'
+        ]
+    })
+
+# DMAIC roadmap: five fixed circles and arrows, so plain HTML built once at import
+_ROADMAP_COLORS = ('#667eea', '#764ba2', '#f093fb', '#4facfe', '#43e97b')
+_ROADMAP_STEP = (
+    '<div style="width: 80px; height: 80px; border-radius: 50%; background-color: {color}; color: white; '
+    'display: flex; align-items: center; justify-content: center; '
+    'font-family: \'Arial Black\', Arial, sans-serif; font-size: 14px;">{phase}</div>'
+)
+_ROADMAP_ARROW = '<span style="font-size: 30px; color: gray;">→</span>'
+_DMAIC_ROADMAP_HTML = (
+    '<p style="font-size: 1.1em; font-weight: bold;">The DMAIC Roadmap</p>\n'
+    '<div style="display: flex; align-items: center; justify-content: space-around; margin: 10px 0 25px 0;">'
+    + _ROADMAP_ARROW.join(_ROADMAP_STEP.format(phase=phase, color=color) for phase, color in zip(_DMAIC_PHASES, _ROADMAP_COLORS))
+    + '</div>'
+)
+
 # ═══════════════════════════════════════════════════════════════════
 # SIDEBAR NAVIGATION
 # ═══════════════════════════════════════════════════════════════════
@@ -355,15 +408,9 @@ with st.sidebar:
     if main_section == '🎯 DMAIC Project':
         st.markdown("### 📈 Project Progress")
         
-        phases_complete = [
-            st.session_state.project_data['define_complete'],
-            st.session_state.project_data['measure_complete'],
-            st.session_state.project_data['analyze_complete'],
-            st.session_state.project_data['improve_complete'],
-            st.session_state.project_data['control_complete'],
-        ]
+        phases_complete = [project[f'{phase.lower()}_complete'] for phase in _DMAIC_PHASES]
         
-        progress = sum(phases_complete) / 5 * 100
+        progress = sum(phases_complete) / len(_DMAIC_PHASES) * 100
         
         st.markdown(f"""
         <div class="progress-bar">
@@ -373,18 +420,17 @@ with st.sidebar:
         """, unsafe_allow_html=True)
         
         st.markdown("#### DMAIC Phases:")
-        phases = ['Define', 'Measure', 'Analyze', 'Improve', 'Control']
-        for i, phase in enumerate(phases):
-            status = "✅" if phases_complete[i] else "⏳"
-            st.markdown(f"{status} **{phase}**")
+        st.markdown("\n\n".join(
+            f"{'✅' if complete else '⏳'} **{phase}**" for phase, complete in zip(_DMAIC_PHASES, phases_complete)
+        ))
         
         st.markdown("---")
         
         # Quick project info
-        if st.session_state.project_data['project_name']:
-            st.markdown(f"**Project:** {st.session_state.project_data['project_name']}")
-            if st.session_state.project_data['baseline_sigma']:
-                st.metric("Baseline Sigma", f"{st.session_state.project_data['baseline_sigma']:.2f}")
+        if project['project_name']:
+            st.markdown(f"**Project:** {project['project_name']}")
+            if project['baseline_sigma']:
+                st.metric("Baseline Sigma", f"{project['baseline_sigma']:.2f}")
     
     st.markdown("---")
     
@@ -674,7 +720,7 @@ if main_section == '🏠 Home':
         """, unsafe_allow_html=True)
         
         if st.button("Go to Encyclopedia →", use_container_width=True):
-            st.session_state.project_data['current_phase'] = 'Encyclopedia'
+            project['current_phase'] = 'Encyclopedia'
             st.rerun()
     
     with col2:
@@ -686,7 +732,7 @@ if main_section == '🏠 Home':
         """, unsafe_allow_html=True)
         
         if st.button("Start DMAIC Project →", use_container_width=True):
-            st.session_state.project_data['current_phase'] = 'DMAIC'
+            project['current_phase'] = 'DMAIC'
             st.rerun()
     
     with col3:
@@ -698,7 +744,7 @@ if main_section == '🏠 Home':
         """, unsafe_allow_html=True)
         
         if st.button("Quick Analysis →", use_container_width=True):
-            st.session_state.project_data['current_phase'] = 'Quick Analysis'
+            project['current_phase'] = 'Quick Analysis'
             st.rerun()
     
     st.markdown("---")
@@ -706,22 +752,7 @@ if main_section == '🏠 Home':
     # Sigma level reference
     st.markdown("## 📊 Quick Reference: Sigma Levels")
     
-    sigma_table = pd.DataFrame({
-        'Sigma Level': [6, 5, 4, 3, 2, 1],
-        'DPMO': [3.4, 233, 6210, 66807, 308538, 690000],
-        'Yield %': [99.99966, 99.9767, 99.379, 93.32, 69.15, 31.00],
-        'Quality Level': ['World Class', 'Excellent', 'Good', 'Average', 'Poor', 'Non-competitive'],
-        'Example': [
-            'Aviation safety',
-            'Top manufacturing',
-            'Most manufacturing',
-            'Typical business',
-            'Service industries',
-            'Unacceptable'
-        ]
-    })
-    
-    st.dataframe(sigma_table, use_container_width=True, hide_index=True)
+    st.dataframe(generate_sigma_reference_table(), use_container_width=True, hide_index=True)
     
     # Chart showing sigma levels
     fig = go.Figure()
@@ -863,7 +894,7 @@ elif main_section == '📚 Encyclopedia':
             
             # Normal distribution
             x = np.linspace(-6, 6, 1000)
-            y = stats.norm.pdf(x, 0, 1)
+            y = _NORM.pdf(x, 0, 1)
             
             fig.add_trace(go.Scatter(
                 x=x, y=y,
@@ -1074,7 +1105,7 @@ elif main_section == '📚 Encyclopedia':
             fig = go.Figure()
             
             x = np.linspace(calc_lsl - 2, calc_usl + 2, 500)
-            y_dist = stats.norm.pdf(x, process_mean, process_std)
+            y_dist = _NORM.pdf(x, process_mean, process_std)
             
             fig.add_trace(go.Scatter(x=x, y=y_dist, fill='tozeroy', name='Process'))
             fig.add_vline(x=calc_lsl, line_dash="dash", line_color="red", annotation_text="LSL")
@@ -1442,40 +1473,8 @@ elif main_section == '📚 Encyclopedia':
             #### The Five Phases Explained
             """)
             
-            # Create visual DMAIC roadmap
-            fig = go.Figure()
-            
-            phases = ['Define', 'Measure', 'Analyze', 'Improve', 'Control']
-            colors = ['#667eea', '#764ba2', '#f093fb', '#4facfe', '#43e97b']
-            
-            for i, (phase, color) in enumerate(zip(phases, colors)):
-                fig.add_trace(go.Scatter(
-                    x=[i], y=[1],
-                    mode='markers+text',
-                    marker=dict(size=80, color=color),
-                    text=phase,
-                    textposition='middle center',
-                    textfont=dict(size=14, color='white', family='Arial Black'),
-                    showlegend=False
-                ))
-                
-                if i < len(phases) - 1:
-                    fig.add_annotation(
-                        x=i+0.5, y=1,
-                        text='→',
-                        showarrow=False,
-                        font=dict(size=30, color='gray')
-                    )
-            
-            fig.update_layout(
-                title="The DMAIC Roadmap",
-                xaxis=dict(showgrid=False, zeroline=False, showticklabels=False, range=[-0.5, 4.5]),
-                yaxis=dict(showgrid=False, zeroline=False, showticklabels=False, range=[0.5, 1.5]),
-                height=200,
-                plot_bgcolor='rgba(0,0,0,0)'
-            )
-            
-            st.plotly_chart(fig, use_container_width=True)
+            # Visual DMAIC roadmap
+            st.markdown(_DMAIC_ROADMAP_HTML, unsafe_allow_html=True)
             
             # Detailed phase breakdown
             col1, col2 = st.columns(2)
@@ -1604,7 +1603,7 @@ elif main_section == '📚 Encyclopedia':
             st.markdown("### 📅 Typical DMAIC Project Timeline")
             
             timeline_data = pd.DataFrame({
-                'Phase': ['Define', 'Measure', 'Analyze', 'Improve', 'Control'],
+                'Phase': _DMAIC_PHASES,
                 'Start': [0, 3, 7, 10, 16],
                 'Duration': [3, 4, 3, 6, 2],
                 'Weeks': ['0-3', '3-7', '7-10', '10-16', '16-18']
@@ -1614,17 +1613,16 @@ elif main_section == '📚 Encyclopedia':
             
             colors_timeline = ['#667eea', '#764ba2', '#f093fb', '#4facfe', '#43e97b']
             
-            for i, row in timeline_data.iterrows():
-                fig.add_trace(go.Bar(
-                    name=row['Phase'],
-                    x=[row['Duration']],
-                    y=[row['Phase']],
-                    orientation='h',
-                    marker=dict(color=colors_timeline[i]),
-                    text=f"{row['Weeks']} weeks",
-                    textposition='inside',
-                    showlegend=False
-                ))
+            # One bar trace for all phases; per-bar colours and labels come from the columns
+            fig.add_trace(go.Bar(
+                x=timeline_data['Duration'],
+                y=timeline_data['Phase'],
+                orientation='h',
+                marker=dict(color=colors_timeline),
+                text=timeline_data['Weeks'] + " weeks",
+                textposition='inside',
+                showlegend=False
+            ))
             
             fig.update_layout(
                 title="DMAIC Project Timeline (Typical 18-24 weeks)",
@@ -1691,7 +1689,7 @@ elif main_section == '📚 Encyclopedia':
                 ]
             }
             
-            tab1, tab2, tab3, tab4, tab5 = st.tabs(['Define', 'Measure', 'Analyze', 'Improve', 'Control'])
+            tab1, tab2, tab3, tab4, tab5 = st.tabs(list(_DMAIC_PHASES))
             
             for tab, (phase, mistakes) in zip([tab1, tab2, tab3, tab4, tab5], mistakes_data.items()):
                 with tab: